@@ -93,7 +93,7 @@ model = client.create_model("Wavepool_1")
 model.param().set("LJ1", L_junction)
 
 #%% geometry
-geom = geometry_mixin(model)
+geom = geometry_mixin(model, lazy=True)
 geom.new_cylinder(name="cyl_cavity", r=r_cavity, l=h_cavity)
 geom.new_cylinder(name="cyl_stub", r=r_stub, l=h_stub)
 
@@ -153,7 +153,7 @@ mesh.finish()
 #%% study
 std1 = study_mixin(model, "std1")
 std1.solve_eigenfrequency(freq=3e9, num=5, mode='lr')
-std1.param_sweep(var="LJ1", rang=[L_junction,2*L_junction])
+std1.param_sweep(var="LJ1", rang=[L_junction,2*L_junction], unit="H")
 
 #%% plot
 pg1 = result_mixin(model, "pg1", "PlotGroup3D")
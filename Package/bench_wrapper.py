@@ -0,0 +1,93 @@
+"""
+Benchmarks for JavaWrapper: attribute dispatch on a plain Python stand-in
+for a Java node, and argument marshalling of long lists (needs a local JVM).
+
+    python bench_wrapper.py
+"""
+import time
+import jpype
+import numpy as np
+
+from comsol_wrapper import JavaWrapper
+
+
+class _Class:
+    def getName(self): return "com.comsol.StandIn"
+    def getSimpleName(self): return "GeomFeatureClient"
+
+
+class _Node:
+    def getClass(self): return _Class()
+    def tag(self): return "cyl"
+    def feature(self, *args): return self
+    def set(self, *args): return self
+
+
+def _convert_list_reference(arg):
+    """Previous element-wise path, kept for comparison."""
+    has_float = any(isinstance(x, (float, np.floating)) for x in arg)
+    first = arg[0]
+    if isinstance(first, bool):
+        return jpype.JArray(jpype.JBoolean)(arg)
+    elif has_float:
+        return jpype.JArray(jpype.JDouble)(arg)
+    elif isinstance(first, int):
+        return jpype.JArray(jpype.JInt)(arg)
+    elif isinstance(first, str):
+        return jpype.JArray(jpype.JString)(arg)
+    return arg
+
+
+def bench_dispatch(n=100000):
+    node = _Node()
+
+    # every hop of a navigation chain creates a fresh wrapper
+    t0 = time.perf_counter()
+    for _ in range(n):
+        JavaWrapper._dispatch.clear()
+        JavaWrapper(node).feature
+    t_cold = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        JavaWrapper(node).feature
+    t_warm = time.perf_counter() - t0
+
+    wrapper = JavaWrapper(node)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        wrapper.feature
+    t_bound = time.perf_counter() - t0
+
+    print(f"per lookup - uncached: {t_cold/n*1e9:.0f} ns, class cache: {t_warm/n*1e9:.0f} ns, "
+          f"bound method reuse: {t_bound/n*1e9:.0f} ns")
+
+
+def bench_marshalling(m=100000):
+    try:
+        if not jpype.isJVMStarted():
+            jpype.startJVM(jpype.getDefaultJVMPath())
+    except Exception as err:
+        print(f"No JVM available, skipping marshalling benchmark ({err})")
+        return
+
+    wrapper = JavaWrapper(_Node())
+    cases = {'float list': [0] + [float(i) for i in range(1, m)],
+             'int list': list(range(m)),
+             'ndarray': np.linspace(0, 1, m)}
+    for label, data in cases.items():
+        t0 = time.perf_counter()
+        ref = _convert_list_reference(list(data) if label == 'ndarray' else data)
+        t_ref = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        new = wrapper._convert_args((data,))[0]
+        t_new = time.perf_counter() - t0
+
+        assert np.array_equal(np.asarray(ref), np.asarray(new))
+        print(f"{label}: element-wise {t_ref*1e3:.1f} ms, bulk {t_new*1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    bench_dispatch()
+    bench_marshalling()
@@ -0,0 +1,49 @@
+import os
+import json
+import hashlib
+import tempfile
+
+
+def cache_dir(*parts):
+    """On-disk cache folder (~/.qcdcomsol, or $QCDCOMSOL_CACHE)."""
+    root = os.environ.get("QCDCOMSOL_CACHE", os.path.join(os.path.expanduser("~"), ".qcdcomsol"))
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def cache_key(*items):
+    return hashlib.sha1(json.dumps(items, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_atomic(path, write, mode='w'):
+    """
+    Calls write(f) on a unique temp file next to `path`, then moves it into place.
+    Concurrent writers (e.g. sweep workers on a cold cache) produce the same content,
+    so losing the race to another process counts as success.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            if not os.path.exists(path):
+                raise
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_json(path, data):
+    write_atomic(path, lambda f: json.dump(data, f))
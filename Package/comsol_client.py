@@ -1,44 +1,145 @@
 import os
 import glob
-import platform
+import pathlib
+import zipfile
 import subprocess
 import time
-import re
 import jpype
 import jpype.imports
 
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from comsol_cache import cache_dir, cache_key, load_json, save_json, write_atomic
+from comsol_server import platform_info, server_command, read_port, port_open, wait_ready, free_port
+
+
+JVM_PROFILES = {
+    # quick start, C1 only (the previous hard-coded settings)
+    'interactive': {'heap': '2g', 'tiered_stop': 1, 'gc': None, 'extra': []},
+    # long sweeps: full C2 JIT for the steady-state JPype bridge
+    'throughput': {'heap': '4g', 'tiered_stop': None, 'gc': 'ParallelGC', 'extra': []},
+    # pulling full field arrays client-side
+    'bigdata': {'heap': '16g', 'tiered_stop': None, 'gc': 'G1GC', 'extra': ['-XX:+UseStringDeduplication']},
+}
+
+
+def jvm_args(profile):
+    if isinstance(profile, str):
+        if profile not in JVM_PROFILES:
+            raise ValueError(f"Unknown JVM profile '{profile}', choose from {list(JVM_PROFILES)}.")
+        profile = JVM_PROFILES[profile]
+
+    args = []
+    if profile.get('heap'):
+        args.append("-Xmx" + profile['heap'])
+    if profile.get('tiered_stop'):
+        args.append(f"-XX:TieredStopAtLevel={profile['tiered_stop']}")
+    if profile.get('gc'):
+        args.append("-XX:+Use" + profile['gc'])
+    return args + list(profile.get('extra', []))
+
+
+def _scan_classpath(comsol_root):
+    plugins_path = os.path.join(comsol_root, "plugins")
+    common_path = os.path.join(comsol_root, "java", "common")
+
+    jars_list = []
+    if os.path.exists(plugins_path):
+        all_files = os.listdir(plugins_path)
+        for f in all_files:
+            if f.endswith(".jar"):
+                f_lower = f.lower()
+                if f_lower.startswith(("com.comsol.", "org.eclipse.", "javax.websocket")):
+                    jars_list.append(os.path.join(plugins_path, f))
+
+    if os.path.exists(common_path):
+        for f in os.listdir(common_path):
+            if f.endswith(".jar"):
+                jars_list.append(os.path.join(common_path, f))
+
+    return sorted(list(set(jars_list)))
+
+
+def _write_manifest_jar(jar_path, jars_list):
+    """Single jar whose manifest Class-Path lists all COMSOL jars."""
+    class_path = " ".join(pathlib.Path(j).as_uri() for j in jars_list)
+    line = "Class-Path: " + class_path
+    # manifest lines are limited to 72 bytes, continuation lines start with a space
+    chunks = [line[:70]] + [" " + line[i:i+69] for i in range(70, len(line), 69)]
+    manifest = "Manifest-Version: 1.0\r\n" + "\r\n".join(chunks) + "\r\n\r\n"
+
+    def write(f):
+        with zipfile.ZipFile(f, 'w') as jar:
+            jar.writestr("META-INF/MANIFEST.MF", manifest)
+    write_atomic(jar_path, write, mode='wb')
+
+
+def resolve_classpath(comsol_root, manifest_jar=False):
+    """
+    Returns the JVM classpath for a COMSOL install. The jar list is cached on
+    disk keyed by the install path and the mtimes of the jar folders (which
+    change whenever COMSOL is updated), so later starts skip the scan.
+    """
+    dirs = [comsol_root, os.path.join(comsol_root, "plugins"), os.path.join(comsol_root, "java", "common")]
+    mtimes = [os.path.getmtime(d) if os.path.exists(d) else None for d in dirs]
+    key = cache_key(os.path.abspath(comsol_root), mtimes)
+
+    manifest_path = os.path.join(cache_dir("classpath"), key + ".json")
+    manifest = load_json(manifest_path)
+    if manifest is None:
+        manifest = {'comsol_root': os.path.abspath(comsol_root), 'jars': _scan_classpath(comsol_root)}
+        save_json(manifest_path, manifest)
+
+    if not manifest_jar:
+        return manifest['jars']
+
+    jar_path = os.path.join(cache_dir("classpath"), key + ".jar")
+    if not os.path.exists(jar_path):
+        _write_manifest_jar(jar_path, manifest['jars'])
+    return [jar_path]
+
 
 class ComsolClient:
     _is_started = False
     _server_process = None
+    _jvm_started_with = None
 
     file_path = os.path.abspath(__file__)
     comsol_client = os.path.dirname(file_path)
 
-    def __init__(self, comsol_root):
+    def __init__(self, comsol_root, pool=None, port=None, timeout=30, autoconnect=True, manifest_jar=False,
+                 jvm_profile=None):
+        """
+        pool: lease a server from a ServerPool instead of launching one.
+        port: connect to an already running server on this port.
+        autoconnect=False leaves it to connect() / connect_async().
+        manifest_jar: put a single manifest jar on the JVM classpath.
+        jvm_profile: name in JVM_PROFILES (or a dict); defaults to $QCDCOMSOL_JVM_PROFILE or "interactive".
+        """
         self.comsol_root = comsol_root
-        self.connect()
+        self.pool = pool
+        self.port = port
+        self.timeout = timeout
+        self.manifest_jar = manifest_jar
+        self.jvm_profile = jvm_profile or os.environ.get("QCDCOMSOL_JVM_PROFILE", "interactive")
+        self.jvm_args = jvm_args(self.jvm_profile)
+        self.ModelUtil = None
+        self.startup_times = {}
+        if autoconnect:
+            self.connect()
 
     def connect(self):
         if self._is_started: return
-
-        # Windows cleanup logic
-        if platform.system() == "Windows":
-            os.system("taskkill /F /IM comsolmphserver.exe /T >nul 2>&1")
+        t_start = time.time()
 
         # --- 1. Platform Detection ---
-        current_os = platform.system()
-        is_mac = (current_os == "Darwin")
-        arch = "macarm64" if (is_mac and platform.machine() == "arm64") else ("maci64" if is_mac else "win64")
-
-        server_exe = "comsol" if is_mac else "comsolmphserver.exe"
-        jvm_lib_name = "libjvm.dylib" if is_mac else "jvm.dll"
-
-        bin_path = os.path.join(self.comsol_root, "bin", arch)
-        server_executable = os.path.join(bin_path, server_exe)
+        info = platform_info(self.comsol_root)
+        is_windows = (info['os'] == "Windows")
+        arch = info['arch']
+        bin_path = info['bin_path']
 
         # --- 2. Windows DLL Environment Fix (KEEPING THIS!) ---
-        if not is_mac:
+        if is_windows:
             lib_path = os.path.join(self.comsol_root, "lib", arch)
             for p in [bin_path, lib_path]:
                 if os.path.exists(p):
@@ -50,96 +151,124 @@ class ComsolClient:
                         except:
                             pass
 
-        # --- 3. Start Server ---
-        # Removed the print(f"Starting Server...") for conciseness
-        cmd = [server_executable, 'server', '-port', '2036'] if is_mac else [server_executable, '-port', '2036']
+        # --- 3. Start Server in the background (or reuse a running one) ---
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            port_future = executor.submit(self._resolve_port, info)
 
-        self._server_process = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-            env=os.environ.copy(), universal_newlines=True, shell=(not is_mac)
-        )
+            # --- 5./6. Classpath scan and JVM start overlap with the server boot ---
+            self._start_jvm(info)
+            t_jvm = time.time()
+            actual_port = port_future.result()
+        t_server = time.time()
 
-        # --- 4. Dynamic Port Capture (KEEPING THIS!) ---
-        actual_port = 2036
-        start_time = time.time()
-        while True:
-            line = self._server_process.stdout.readline()
-            if line:
-                # Silenced: print(f"Server Log: {line.strip()}")
-                match = re.search(r"listening on port\s+(\d+)", line)
-                if match:
-                    actual_port = int(match.group(1))
-                    break
-            if time.time() - start_time > 30:
+        # --- 7. Final Connection ---
+        from com.comsol.model.util import ModelUtil
+
+        connected = False
+        for i in range(20):
+            try:
+                ModelUtil.connect("localhost", actual_port)
+                connected = True
                 break
+            except:
+                time.sleep(0.1)
 
-        # --- 5. REFINED CLASSPATH (High Speed Memory Filter - KEEPING ALL!) ---
-        plugins_path = os.path.join(self.comsol_root, "plugins")
-        common_path = os.path.join(self.comsol_root, "java", "common")
+        if not connected:
+            raise RuntimeError(f"Failed to connect to COMSOL at port {actual_port} after 2s.")
 
-        jars_list = []
-        if os.path.exists(plugins_path):
-            all_files = os.listdir(plugins_path)
-            for f in all_files:
-                if f.endswith(".jar"):
-                    f_lower = f.lower()
-                    if f_lower.startswith(("com.comsol.", "org.eclipse.", "javax.websocket")):
-                        jars_list.append(os.path.join(plugins_path, f))
+        self.ModelUtil = ModelUtil
+        self.port = actual_port
+        self.startup_times.update({'jvm': t_jvm - t_start,
+                                   'connect': time.time() - t_server,
+                                   'total': time.time() - t_start})
+        ComsolClient._is_started = True
+        print(f">>> COMSOL Connected Successfully (Port: {actual_port}) <<<")
 
-        if os.path.exists(common_path):
-            for f in os.listdir(common_path):
-                if f.endswith(".jar"):
-                    jars_list.append(os.path.join(common_path, f))
+    def connect_async(self):
+        """Runs connect() on a background thread; returns its Future."""
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(self.connect)
+        executor.shutdown(wait=False)
+        return future
 
-        jars_list = sorted(list(set(jars_list)))
+    def _start_jvm(self, info):
+        # --- 5. REFINED CLASSPATH (cached manifest, scanned only when the install changes) ---
+        jars_list = resolve_classpath(self.comsol_root, self.manifest_jar)
 
         # --- 6. Start JVM ---
         if not jpype.isJVMStarted():
-            if is_mac:
-                jvm_path = os.path.join(self.comsol_root, "java", arch, "jre", "Contents", "Home", "lib", "server",
-                                        jvm_lib_name)
-            else:
-                jvm_path = os.path.join(self.comsol_root, "java", arch, "jre", "bin", "server", jvm_lib_name)
-
+            args = jvm_args(self.jvm_profile)
             jpype.startJVM(
-                jvm_path,
+                info['jvm_path'],
                 f"-Djava.class.path={os.path.pathsep.join(jars_list)}",
-                "-XX:TieredStopAtLevel=1",
                 "-Dcs.standalone=false",
                 "-Dcs.display=headless",
-                "-Xmx2g",
+                *args,
                 convertStrings=True
             )
+            ComsolClient._jvm_started_with = (self.jvm_profile, args)
 
-            # --- 7. Final Connection ---
-            from com.comsol.model.util import ModelUtil
+        # one JVM per process: report the profile it was actually started with
+        if ComsolClient._jvm_started_with is not None:
+            self.jvm_profile, self.jvm_args = ComsolClient._jvm_started_with
 
-            connected = False
-            for i in range(20):
-                try:
-                    ModelUtil.connect("localhost", actual_port)
-                    connected = True
-                    break
-                except:
-                    time.sleep(0.1)
+    def _resolve_port(self, info):
+        t_start = time.time()
+        if self.port is not None:
+            actual_port = self.port
+        elif self.pool is not None:
+            actual_port = self.pool.acquire()
+        else:
+            actual_port = self._start_server(info)
 
-            if not connected:
-                raise RuntimeError(f"Failed to connect to COMSOL at port {actual_port} after 2s.")
+        if not wait_ready(actual_port, max(self.timeout - (time.time() - t_start), 0)):
+            raise RuntimeError(f"COMSOL server on port {actual_port} is not accepting connections.")
 
-            self.ModelUtil = ModelUtil
-            ComsolClient._is_started = True
-            print(f">>> COMSOL Connected Successfully (Port: {actual_port}) <<<")
+        self.startup_times['server'] = time.time() - t_start
+        return actual_port
+
+    def _start_server(self, info):
+        # own server on a free port; other servers on this machine (e.g. leased from a pool) are left alone
+        port = free_port()
+        cmd = server_command(self.comsol_root, port)
+
+        self._server_process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            env=os.environ.copy(), universal_newlines=True
+        )
+
+        # --- 4. Dynamic Port Capture (background reader, bounded wait) ---
+        try:
+            return read_port(self._server_process.stdout).result(timeout=self.timeout)
+        except (FutureTimeout, RuntimeError):
+            # fall back to the requested port only if our server is alive and listens there
+            if (self._server_process.poll() is None) and port_open(port):
+                return port
+            self._kill_server()
+            raise RuntimeError(f"COMSOL server did not report a port within {self.timeout}s.")
+
+    def _kill_server(self):
+        """Stops the server this client started (and its child processes), nothing else."""
+        if platform_info(self.comsol_root)['os'] == "Windows":
+            subprocess.call(["taskkill", "/F", "/T", "/PID", str(self._server_process.pid)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            self._server_process.kill()
+        self._server_process = None
 
     def disconnect(self):
+        if self.ModelUtil:
+            try:
+                self.ModelUtil.disconnect()
+            except:
+                pass
         if self._server_process:
-            if self.ModelUtil:
-                try:
-                    self.ModelUtil.disconnect()
-                except:
-                    pass
-            self._server_process.kill()
-            ComsolClient._is_started = False
-            print(">>> COMSOL Disconnected <<<")
+            self._kill_server()
+        elif (self.pool is not None) and (self.port is not None):
+            # keep the server warm for the next lease
+            self.pool.release(self.port)
+        ComsolClient._is_started = False
+        print(">>> COMSOL Disconnected <<<")
 
     def create_model(self, mph_name):
         from comsol_wrapper import JavaWrapper
@@ -1,23 +1,97 @@
+import copy
 import numpy as np
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+
+
+#%% symbolic values: numbers stay numbers, anything else becomes a COMSOL expression
+def _is_num(x):
+    return isinstance(x, (int, float, np.number)) and not isinstance(x, bool)
+
+def _expr(x):
+    # float() first: repr(np.float64(x)) is 'np.float64(x)' with numpy 2
+    return repr(float(x)) if _is_num(x) else str(x)
+
+def _add(a, b):
+    if _is_num(a) and _is_num(b):
+        return a + b
+    return f"({_expr(a)})+({_expr(b)})"
+
+def _scale(a, k):
+    if _is_num(a):
+        return a * k
+    return f"({_expr(a)})*({_expr(k)})"
+
 
 class geometry_mixin:
-    def __init__(self, model):
+    def __init__(self, model, lazy=False):
+        """
+        lazy=True queues features and builds the sequence once at finish().
+        Dimensions may be numbers, parameter names/expressions ("r_cavity"), or
+        (name, value) tuples which also register the parameter in model.param().
+        """
         comp = model.modelNode("comp1")
         geom = comp.geom().create("geom1", 3)
         comp.view("view1").set("transparency", True)
 
+        self._model = model
         self._comp = comp
         self._geom = geom
+        self.params = {}
+        self._lazy = lazy
+        self._applied = {}
+        self.run_count = 0
 
-    def new_cylinder(self, *, name, r, l, ax='z', pos=[0,0,0], mid_plane=False):
-        pos = list(pos)
+    #%% parameters
+    def param(self, name, value, descr=""):
+        """Registers (or updates) a global parameter and returns its name for use as a dimension."""
+        if self.params.get(name) != value:
+            self._model.param().set(name, _expr(value), descr)
+            self.params[name] = value
+        return name
+
+    def _bind(self, value):
+        if isinstance(value, tuple) and (len(value) == 2) and isinstance(value[0], str):
+            return self.param(*value)
+        return value
+
+    #%% build control
+    def _run(self, name):
+        if not self._lazy:
+            self.build_to(name)
 
+    def build_to(self, name=None):
+        """Builds the sequence up to `name` (all if None), e.g. when a selection is needed mid-design."""
+        if name is None:
+            self._geom.run()
+        else:
+            self._geom.run(name)
+        self.run_count += 1
+
+    @contextmanager
+    def deferred(self):
+        """Queues feature creation inside the block; the sequence is built at finish()."""
+        lazy = self._lazy
+        self._lazy = True
+        try:
+            yield self
+        finally:
+            self._lazy = lazy
+
+    def new_cylinder(self, *, name, r, l, ax='z', pos=[0,0,0], mid_plane=False):
         _cyl = self._geom.feature().create(name, "Cylinder")
         _cyl.label(name)
         _cyl.set("selresult", True)
 
         # model.component("comp1").geom("geom1").feature("dif2").set("selresultshow", "bnd");
 
+        self._set_cylinder(_cyl, r=r, l=l, ax=ax, pos=pos, mid_plane=mid_plane)
+        self._run(name)
+
+    def _set_cylinder(self, _cyl, *, r, l, ax='z', pos=[0,0,0], mid_plane=False):
+        r, l = self._bind(r), self._bind(l)
+        pos = [self._bind(_p) for _p in pos]
+
         _cyl.set('r', r)
         _cyl.set('h', l)
         _cyl.set('axistype', ax)
@@ -26,18 +100,21 @@ class geometry_mixin:
             _cyl.set("pos", pos)
         else:
             idx_l = 'xyz'.find(ax)
-            pos[idx_l] += -l/2
+            pos[idx_l] = _add(pos[idx_l], _scale(l, -1/2))
             _cyl.set("pos", pos)
 
-        self._geom.run(name)
-
     def new_block(self, *, name, w, h, l, ax='z', pos=[0, 0, 0], mid_plane=False):
-        pos = list(pos)
-
         _blk = self._geom.feature().create(name, "Block")
         _blk.label(name)
         _blk.set("selresult", True)
 
+        self._set_block(_blk, w=w, h=h, l=l, ax=ax, pos=pos, mid_plane=mid_plane)
+        self._run(name)
+
+    def _set_block(self, _blk, *, w, h, l, ax='z', pos=[0, 0, 0], mid_plane=False):
+        w, h, l = self._bind(w), self._bind(h), self._bind(l)
+        pos = [self._bind(_p) for _p in pos]
+
         _blk.set('size', [w, h, l])
         _blk.set('axistype', ax)
 
@@ -46,32 +123,77 @@ class geometry_mixin:
             _blk.set("pos", pos)
         else:
             idx_l = 'xyz'.find(ax)
-            pos[idx_l] += l/ 2
+            pos[idx_l] = _add(pos[idx_l], _scale(l, 1/2))
             _blk.set("pos", pos)
 
-        self._geom.run(name)
-
     def new_coaxport(self, *, name, r1, r2, l1, l2, ax='z', pos=[0,0,0], mid_plane=False):
-        pos = list(pos)
-
         self.new_cylinder(name=name+'1', r=r1, l=l1, ax=ax,
                           pos=pos, mid_plane=mid_plane)
         self.new_cylinder(name=name+'2', r=r2, l=l2, ax=ax,
                           pos=pos, mid_plane=mid_plane)
 
-        self._geom.run(name+'1')
-        self._geom.run(name+'2')
-
         bnd_port = self._comp.selection().create(name+'_bnd', "Box")
         bnd_port.set("entitydim", 2)
 
+        self._set_coaxport_bnd(bnd_port, r1=r1, r2=r2, ax=ax, pos=pos)
+
+    def _set_coaxport_bnd(self, bnd_port, *, r1, r2, ax='z', pos=[0,0,0]):
+        r1, r2 = self._bind(r1), self._bind(r2)
+        pos = [self._bind(_p) for _p in pos]
+
         eps = 1e-6
         for _idx, _ax in enumerate(['x', 'y', 'z']):
             if _ax != ax:
-                pos[_idx] += (r1 + r2) / (2*np.sqrt(2))
+                pos[_idx] = _add(pos[_idx], _scale(_add(r1, r2), 1/(2*np.sqrt(2))))
+
+            bnd_port.set(_ax+"max", _add(pos[_idx], eps))
+            bnd_port.set(_ax+"min", _add(pos[_idx], -eps))
+
+    #%% repeated structures
+    def new_cylinders(self, *, name, positions, r, l, ax='z', mid_plane=False):
+        """
+        N identical cylinders at positions (N, 3) as one template cylinder plus one Copy,
+        i.e. two features and one build regardless of N. Selection: geom1_<name>_dom.
+        """
+        positions = np.atleast_2d(np.asarray(positions, dtype=float))
+        with self.deferred():
+            self.new_cylinder(name=name+'_unit', r=r, l=l, ax=ax, pos=list(positions[0]), mid_plane=mid_plane)
+            self.pattern(name=name, input=[name+'_unit'], displ=positions - positions[0])
+        self._run(name)
+
+    def array(self, *, name, input, size, displ, keep_input=False):
+        """Rectangular array of the input objects, size=[nx, ny, nz] copies spaced by displ=[dx, dy, dz]."""
+        _arr = self._geom.feature().create(name, "Array")
+        _arr.label(name)
+        _arr.set("selresult", True)
 
-            bnd_port.set(_ax+"max", pos[_idx] + eps)
-            bnd_port.set(_ax+"min", pos[_idx] - eps)
+        self._set_array(_arr, input=input, size=size, displ=displ, keep_input=keep_input)
+        self._run(name)
+
+    def _set_array(self, _arr, *, input, size, displ, keep_input=False):
+        _arr.selection("input").set(input)
+
+        _arr.set("type", "three")
+        _arr.set("fullsize", [int(_n) for _n in size])
+        _arr.set("displ", [self._bind(_d) for _d in displ])
+        _arr.set("keep", keep_input)
+
+    def pattern(self, *, name, input, displ, keep_input=False):
+        """Copies of the input objects at arbitrary displacements displ (N, 3), one Copy feature."""
+        _cpy = self._geom.feature().create(name, "Copy")
+        _cpy.label(name)
+        _cpy.set("selresult", True)
+
+        self._set_pattern(_cpy, input=input, displ=displ, keep_input=keep_input)
+        self._run(name)
+
+    def _set_pattern(self, _cpy, *, input, displ, keep_input=False):
+        displ = np.atleast_2d(np.asarray(displ, dtype=float))
+        _cpy.selection("input").set(input)
+
+        for _idx, _ax in enumerate(['x', 'y', 'z']):
+            _cpy.set("displ" + _ax, displ[:, _idx])
+        _cpy.set("keep", keep_input)
 
     #%% boolean
     def union(self, *, name, input, keep_input, keep_intb):
@@ -79,19 +201,26 @@ class geometry_mixin:
         _uni.label(name)
         _uni.set("selresult", True)
 
+        self._set_union(_uni, input=input, keep_input=keep_input, keep_intb=keep_intb)
+        self._run(name)
+
+    def _set_union(self, _uni, *, input, keep_input, keep_intb):
         _uni.selection("input").set(input)
 
         _uni.set("keepadd", keep_input)
         _uni.set("intbnd", keep_intb)
 
-        self._geom.run(name)
-
     def difference(self, *, name, input1, input2, keep_input1, keep_input2, keep_intb):
         _dif = self._geom.feature().create(name, "Difference")
         _dif.label(name)
         _dif.set("selresult", True)
         _dif.set("selresultshow", "dom")
 
+        self._set_difference(_dif, input1=input1, input2=input2, keep_input1=keep_input1,
+                             keep_input2=keep_input2, keep_intb=keep_intb)
+        self._run(name)
+
+    def _set_difference(self, _dif, *, input1, input2, keep_input1, keep_input2, keep_intb):
         _dif.selection("input").set(input1)
         _dif.selection("input2").set(input2)
 
@@ -99,7 +228,192 @@ class geometry_mixin:
         _dif.set("keepsubtract", keep_input2)
         _dif.set("intbnd", keep_intb)
 
-        self._geom.run(name)
+    #%% declarative spec
+    def apply(self, spec):
+        """
+        Applies a list of feature specs (Cylinder, Block, CoaxPort, Array, Pattern, Union, Difference).
+        The first call creates everything; later calls diff against the last spec and
+        only re-set changed features, create new ones (moved to their spec position in
+        the sequence) and remove dropped ones, then rebuild. COMSOL only re-runs the
+        sequence from the first invalidated feature. Returns the names of the touched features.
+        """
+        changed = []
+        with self.deferred():
+            prev = None
+            for feat in spec:
+                old = self._applied.get(feat.name)
+                if old != feat:
+                    if (old is not None) and (type(old) is type(feat)):
+                        self._update(feat)
+                    else:
+                        if old is not None:
+                            self._remove(old)
+                        getattr(self, feat._creator)(**feat.params(with_name=True))
+                        self._place(feat, prev)
+                    changed.append(feat.name)
+                prev = _tags(feat)[-1]
+
+            names = {feat.name for feat in spec}
+            for name, old in list(self._applied.items()):
+                if name not in names:
+                    self._remove(old)
+                    changed.append(name)
+
+        # copies: specs edited in place by the caller must still show up as changes
+        self._applied = {feat.name: copy.deepcopy(feat) for feat in spec}
+        if changed:
+            self.finish()
+        return changed
+
+    def _place(self, feat, prev):
+        """Moves the features of a newly created spec entry right after `prev` (first if None)."""
+        tags = list(self._geom.feature().tags())
+        idx = 0 if prev is None else tags.index(prev) + 1
+        for _tag in _tags(feat):
+            if tags.index(_tag) != idx:
+                self._geom.feature().move(_tag, idx)
+                tags.remove(_tag)
+                tags.insert(idx, _tag)
+            idx += 1
+
+    def _update(self, feat):
+        params = feat.params()
+        if isinstance(feat, CoaxPort):
+            self._set_cylinder(self._geom.feature(feat.name+'1'), r=params['r1'], l=params['l1'], ax=params['ax'],
+                               pos=params['pos'], mid_plane=params['mid_plane'])
+            self._set_cylinder(self._geom.feature(feat.name+'2'), r=params['r2'], l=params['l2'], ax=params['ax'],
+                               pos=params['pos'], mid_plane=params['mid_plane'])
+            self._set_coaxport_bnd(self._comp.selection(feat.name+'_bnd'), r1=params['r1'], r2=params['r2'],
+                                   ax=params['ax'], pos=params['pos'])
+        else:
+            getattr(self, feat._setter)(self._geom.feature(feat.name), **params)
+
+    def _remove(self, feat):
+        if isinstance(feat, CoaxPort):
+            self._geom.feature().remove(feat.name+'1')
+            self._geom.feature().remove(feat.name+'2')
+            self._comp.selection().remove(feat.name+'_bnd')
+        else:
+            self._geom.feature().remove(feat.name)
 
     def finish(self):
-        self._geom.run()
\ No newline at end of file
+        self.build_to()
+
+
+#%% declarative geometry description, see geometry_mixin.apply
+def _tags(feat):
+    """Geometry feature tags created for a spec entry, in sequence order."""
+    if isinstance(feat, CoaxPort):
+        return [feat.name+'1', feat.name+'2']
+    return [feat.name]
+
+
+def _plain(value):
+    """ndarrays and numpy scalars (also inside lists/tuples) as Python values, so specs compare with ==."""
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, list):
+        return [_plain(_v) for _v in value]
+    if isinstance(value, tuple):
+        return tuple(_plain(_v) for _v in value)
+    return value
+
+
+class _Spec:
+    def __post_init__(self):
+        for f in fields(self):
+            setattr(self, f.name, _plain(getattr(self, f.name)))
+
+    def params(self, with_name=False):
+        params = {f.name: getattr(self, f.name) for f in fields(self)}
+        if not with_name:
+            del params['name']
+        return params
+
+
+@dataclass
+class Cylinder(_Spec):
+    name: str
+    r: float
+    l: float
+    ax: str = 'z'
+    pos: list = field(default_factory=lambda: [0, 0, 0])
+    mid_plane: bool = False
+
+    _creator = 'new_cylinder'
+    _setter = '_set_cylinder'
+
+
+@dataclass
+class Block(_Spec):
+    name: str
+    w: float
+    h: float
+    l: float
+    ax: str = 'z'
+    pos: list = field(default_factory=lambda: [0, 0, 0])
+    mid_plane: bool = False
+
+    _creator = 'new_block'
+    _setter = '_set_block'
+
+
+@dataclass
+class CoaxPort(_Spec):
+    name: str
+    r1: float
+    r2: float
+    l1: float
+    l2: float
+    ax: str = 'z'
+    pos: list = field(default_factory=lambda: [0, 0, 0])
+    mid_plane: bool = False
+
+    _creator = 'new_coaxport'
+
+
+@dataclass
+class Array(_Spec):
+    name: str
+    input: list
+    size: list
+    displ: list
+    keep_input: bool = False
+
+    _creator = 'array'
+    _setter = '_set_array'
+
+
+@dataclass
+class Pattern(_Spec):
+    name: str
+    input: list
+    displ: list
+    keep_input: bool = False
+
+    _creator = 'pattern'
+    _setter = '_set_pattern'
+
+
+@dataclass
+class Union(_Spec):
+    name: str
+    input: list
+    keep_input: bool
+    keep_intb: bool
+
+    _creator = 'union'
+    _setter = '_set_union'
+
+
+@dataclass
+class Difference(_Spec):
+    name: str
+    input1: list
+    input2: list
+    keep_input1: bool
+    keep_input2: bool
+    keep_intb: bool
+
+    _creator = 'difference'
+    _setter = '_set_difference'
@@ -1,45 +1,160 @@
 import os
-import numpy as np
-import textwrap
 import re
-import jpype
+import ast
+import hashlib
+import numpy as np
+
+from comsol_cache import cache_dir, load_json, save_json
+
+#%% material files (COMSOL Java exports) -> cached list of operations
+_PARSER_VERSION = 1
+_STRING = re.compile(r'("(?:[^"\\]|\\.)*")')
+_PREFIX = re.compile(r'^model\.component\("[^"]*"\)\.material\("[^"]*"\)')
+_compiled = {}
+
+
+def _java_literal(text):
+    """Java argument list -> Python tuple, e.g. 'new String[]{"a", "b"}, true' -> (['a', 'b'], True)."""
+    parts = _STRING.split(text)
+    for _idx in range(0, len(parts), 2):
+        _p = re.sub(r'new\s+\w+(\[\])+\s*', '', parts[_idx])
+        _p = re.sub(r'\((double|int|float|String|boolean)\)', '', _p)
+        _p = re.sub(r'\btrue\b', 'True', re.sub(r'\bfalse\b', 'False', _p))
+        parts[_idx] = _p.replace('{', '[').replace('}', ']')
+    text = "".join(parts).strip()
+    if not text:
+        return ()
+    return ast.literal_eval("(" + text + ",)")
+
+
+def _split_calls(chain):
+    """'.a("x").b().c(1, "y)")' -> [('a', '"x"'), ('b', ''), ('c', '1, "y)"')]"""
+    calls, pos = [], 0
+    while pos < len(chain):
+        match = re.compile(r'\.\s*(\w+)\s*\(').match(chain, pos)
+        if match is None:
+            raise ValueError(f"Cannot parse material statement near: {chain[pos:pos+40]!r}")
+        depth, pos, in_str = 1, match.end(), False
+        while depth:
+            _c = chain[pos]
+            if in_str:
+                if _c == '\\':
+                    pos += 1
+                elif _c == '"':
+                    in_str = False
+            elif _c == '"':
+                in_str = True
+            elif _c == '(':
+                depth += 1
+            elif _c == ')':
+                depth -= 1
+            pos += 1
+        calls.append((match.group(1), chain[match.end():pos-1]))
+    return calls
+
+
+def parse_material(text):
+    """
+    Parses a COMSOL material export into groups of calls on the same node:
+    [{'path': [[method, args], ...], 'calls': [[method, args], ...]}, ...]
+    where path navigates from the material node. Statement order is kept.
+    """
+    text = re.sub(r'\n\s*\.', '.', text)
+    groups = []
+    for statement in text.split(';\n'):
+        statement = statement.strip().rstrip(';')
+        if not statement:
+            continue
+        match = _PREFIX.match(statement)
+        if match is None:
+            raise ValueError(f"Not a material statement: {statement[:60]!r}")
+
+        calls = [[_m, list(_java_literal(_a))] for _m, _a in _split_calls(statement[match.end():])]
+        path, call = calls[:-1], calls[-1]
+        if groups and (groups[-1]['path'] == path):
+            groups[-1]['calls'].append(call)
+        else:
+            groups.append({'path': path, 'calls': [call]})
+    return groups
+
+
+def compile_material(material_path):
+    """Parsed material file, memoized per process and on disk by content hash."""
+    with open(material_path, 'rb') as f:
+        raw = f.read()
+    key = hashlib.sha1(raw).hexdigest()
+
+    if key not in _compiled:
+        cache_path = os.path.join(cache_dir("materials"), f"{key}_v{_PARSER_VERSION}.json")
+        groups = load_json(cache_path)
+        if groups is None:
+            groups = parse_material(raw.decode())
+            save_json(cache_path, groups)
+        _compiled[key] = groups
+    return _compiled[key]
+
 
 class material_mixin:
-    def __init__(self, model, name):
+    def __init__(self, model, name, link=False):
+        """
+        link=True defines the material once under model.material() and references it
+        from comp1 with a Link node; further instances of the same material in this
+        model (other selections, later sweep points) reuse the global definition.
+        """
         comp = model.modelNode("comp1")
-        mat = comp.material().create(name, "Common")
 
         self._comp = comp
-        self._mat = mat
         self._name = name
 
+        if link:
+            mat = self._global_material(model, name)
+            lnk = comp.material().create(comp.material().uniquetag("matlnk"), "Link")
+            lnk.set("link", name)
+            self._mat = mat
+            self._sel = lnk
+        else:
+            mat = comp.material().create(name, "Common")
+            self._mat = mat
+            self._sel = mat
+            self._load(model, mat, name)
+
+    def _global_material(self, model, name):
+        # per-model registry, shared by all wrappers of this model
+        registry = model._cache.setdefault('materials', {})
+        mat = registry.get(name)
+        if mat is None:
+            if name in list(model.material().tags()):
+                mat = model.material(name)
+            else:
+                mat = model.material().create(name, "Common")
+                self._load(model, mat, name, with_selection=False)
+            registry[name] = mat
+        return mat
+
+    def _load(self, model, mat, name, with_selection=True):
         material_path = os.path.join(model._comsol_client, "material", "comsol_" + name + '.txt')
         if os.path.exists(material_path):
-            self.builtin_material(material_path)
-
-    def builtin_material(self, material_path):
-        context = {'_mat': self._mat,
-                   'true': True,
-                   'false': False}
-        with open(material_path, 'r') as f:
-            clean_code = re.sub(r'new\s+\w+(?=\()', '', f.read())
-            clean_code = re.sub(r'new\s+\w+(\[\])+\s*\{', '[', clean_code)
-            clean_code = re.sub(r'\((double|int|float|String|boolean)\)', '', clean_code)
-            clean_code = clean_code.replace('{', '[').replace('}', ']').replace(';', '')
-            clean_code = clean_code.replace('model.component("comp1").material("mat1")', '_mat')
-
-            clean_code = textwrap.dedent(clean_code)
-            lines = [line.strip() for line in clean_code.splitlines() if line.strip()]
-
-            processed_lines = []
-            for line in lines:
-                if line.startswith(".") and processed_lines:
-                    processed_lines[-1] = processed_lines[-1] + line
-                else:
-                    processed_lines.append(line)
-
-            clean_code = "\n".join(processed_lines)
-            exec(clean_code, globals(), context)
+            self.builtin_material(material_path, mat, with_selection)
+
+    def builtin_material(self, material_path, mat=None, with_selection=True):
+        if mat is None:
+            mat = self._mat
+        nodes = {(): mat}
+        for group in compile_material(material_path):
+            # global materials have no geometric selection, the Link node carries it
+            if (not with_selection) and (group['path'][:1] == [['selection', []]]):
+                continue
+            # resolve the target node once per group of consecutive calls
+            path = tuple((_m, tuple(_a)) for _m, _a in group['path'])
+            node = nodes.get(path)
+            if node is None:
+                node = mat
+                for _m, _a in group['path']:
+                    node = getattr(node, _m)(*_a)
+                nodes[path] = node
+
+            for _m, _a in group['calls']:
+                getattr(node, _m)(*_a)
 
     def new_param(self, *, tags, values):
         if not isinstance(tags, (list, tuple, np.ndarray)):
@@ -53,4 +168,4 @@ class material_mixin:
             objs = [objs]
 
         for _obj in objs:
-            self._mat.selection().named("geom1_" + _obj + "_dom")
\ No newline at end of file
+            self._sel.selection().named("geom1_" + _obj + "_dom")
\ No newline at end of file
@@ -1,26 +1,214 @@
+import os
+import time
+import hashlib
+import tempfile
+import numpy as np
+
+from comsol_cache import cache_dir, cache_key, load_json, save_json
+from comsol_result import eval_global_mixin
+
+
 class mesh_mixin:
-    def __init__(self, model, name="mesh1"):
+    levels = {
+        'extremely fine': 1,
+        'extra fine': 2,
+        'finer': 3,
+        'fine': 4,
+        'normal': 5,
+        'coarse': 6,
+        'coarser': 7,
+        'extra coarse': 8,
+        'extremely coarse': 9
+    }
+
+    def __init__(self, model, name="mesh1", cache_file=False):
+        """
+        cache_file=True exports every new mesh to the local cache (keyed by the geometry
+        and mesh-settings fingerprint) and imports it instead of meshing when a model is
+        rebuilt with identical geometry, e.g. in a sweep over LJ1.
+        Only user-controlled sequences (size()/free_tet()) are skipped or cached: after auto()
+        alone COMSOL sizes the mesh from physics, materials and frequency as well.
+        """
         comp = model.modelNode("comp1")
         mesh = comp.mesh().create("mesh1")
 
+        self._model = model
         self._comp = comp
         self._mesh = mesh
         self._name = name
+        self._sizes = []
+        # effective mesh settings (not the call history), part of the fingerprint
+        self._settings = {'auto': None, 'sizes': {}, 'free_tet': None}
+        self._cache_file = cache_file
+        self._built = None
+        self.stats = {}
 
     def auto(self, key):
-        levels = {
-            'extremely fine': 1,
-            'extra fine': 2,
-            'finer': 3,
-            'fine': 4,
-            'normal': 5,
-            'coarse': 6,
-            'coarser': 7,
-            'extra coarse': 8,
-            'extremely coarse': 9
-        }
-
-        self._mesh.autoMeshSize(levels[key])
+        self._settings['auto'] = mesh_mixin.levels[key]
+        if self._sizes:
+            # user-controlled sequence: the global Size node holds the predefined level
+            self._mesh.feature("size").set("hauto", mesh_mixin.levels[key])
+        else:
+            self._mesh.autoMeshSize(mesh_mixin.levels[key])
+
+    #%% local size control
+    def size(self, name, objs, *, dim=3, level=None, hmax=None, hmin=None):
+        """
+        Size feature(s) on named geometry selections, e.g. finer on the chip:
+        mesh.size("size_chip", "blk_chip", hmax=50e-6), or level='coarse' in bulk air.
+        dim=3 uses geom1_<obj>_dom, dim=2 the <obj>_bnd selections.
+        """
+        if not isinstance(objs, (list, tuple, np.ndarray)):
+            objs = [objs]
+
+        for _obj in objs:
+            self._settings['sizes'][name + '_' + _obj] = [dim, level, hmax, hmin]
+            _size = self._mesh.feature().create(name + '_' + _obj, "Size")
+            _size.label(name + '_' + _obj)
+            _size.selection().geom("geom1", dim)
+            if dim == 3:
+                _size.selection().named("geom1_" + _obj + "_dom")
+            else:
+                _size.selection().named(_obj + "_bnd")
+
+            if level is not None:
+                _size.set("hauto", mesh_mixin.levels[level])
+            if (hmax is not None) or (hmin is not None):
+                _size.set("custom", True)
+            if hmax is not None:
+                _size.set("hmaxactive", True)
+                _size.set("hmax", hmax)
+            if hmin is not None:
+                _size.set("hminactive", True)
+                _size.set("hmin", hmin)
+            self._sizes.append(_size)
+
+    def free_tet(self, name="ftet1"):
+        self._settings['free_tet'] = name
+        self._mesh.feature().create(name, "FreeTet")
+        self._tet = name
+
+    def fingerprint(self):
+        """Hash of the built geometry (vertex coordinates, entity counts) and the mesh settings."""
+        geom = self._comp.geom("geom1")
+        geom.run()
+        coords = np.ascontiguousarray(np.asarray(geom.getVertexCoord(), dtype=float))
+        return cache_key(hashlib.sha1(coords.round(12).tobytes()).hexdigest(),
+                         geom.getNDomains(), geom.getNBoundaries(), self._settings)
 
     def finish(self):
-        self._mesh.run()
\ No newline at end of file
+        """Meshes unless geometry and settings are unchanged since the last run (or cached on disk)."""
+        if self._sizes and not hasattr(self, '_tet'):
+            self.free_tet()
+
+        # a physics-controlled mesh depends on more than the fingerprint covers
+        user_controlled = bool(self._sizes) or hasattr(self, '_tet')
+        key = self.fingerprint() if user_controlled else None
+        if (key is not None) and (key == self._built):
+            return self.stats
+
+        start_time = time.perf_counter()
+        stats = None
+        cache_file = self._cache_file and user_controlled
+        if cache_file:
+            mesh_path = os.path.join(cache_dir("meshes"), key + ".mphbin")
+            stats_path = os.path.join(cache_dir("meshes"), key + ".json")
+            stats = load_json(stats_path) if os.path.exists(mesh_path) else None
+
+        if stats is not None:
+            self._set_import(mesh_path)
+            self._mesh.run()
+            self.mesh_time = time.perf_counter() - start_time
+            stats['imported'] = True
+        else:
+            self._set_import(None)
+            self._mesh.run()
+            self.mesh_time = time.perf_counter() - start_time
+            stats = self._stats()
+            if cache_file:
+                self._export(mesh_path)
+                # written last: a stats file marks a complete mesh file
+                save_json(stats_path, stats)
+
+        stats['mesh_time'] = self.mesh_time
+        self.stats = stats
+        self._built = key
+        return stats
+
+    def _export(self, mesh_path):
+        """Exports through a unique temp file, so concurrent workers never expose a partial mesh."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(mesh_path),
+                                        prefix=os.path.basename(mesh_path) + ".", suffix=".mphbin")
+        os.close(fd)
+        try:
+            self._mesh.export(tmp_path)
+            try:
+                os.replace(tmp_path, mesh_path)
+            except OSError:
+                # another worker placed the same mesh first
+                if not os.path.exists(mesh_path):
+                    raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _stats(self):
+        stat = self._mesh.stat()
+        return {'elements': int(stat.getNumElem()), 'min_quality': float(stat.getMinQuality()),
+                'mean_quality': float(stat.getMeanQuality()), 'mesh_time': self.mesh_time}
+
+    def _set_import(self, mesh_path):
+        """Switches the sequence to a single Import of mesh_path, or back to meshing if None."""
+        tags = list(self._mesh.feature().tags())
+        if (mesh_path is None) and ("imp_cache" not in tags):
+            return
+
+        # the native format keeps the entity numbering, so geometry selections stay
+        # valid for the identical geometry the fingerprint guarantees
+        if "imp_cache" not in tags:
+            self._mesh.feature().create("imp_cache", "Import")
+            self._mesh.feature().move("imp_cache", 0)
+        for _tag in tags:
+            if _tag not in ("size", "imp_cache"):
+                self._mesh.feature(_tag).active(mesh_path is None)
+
+        _imp = self._mesh.feature("imp_cache")
+        _imp.active(mesh_path is not None)
+        if mesh_path is not None:
+            _imp.set("source", "native")
+            _imp.set("filename", mesh_path)
+
+    #%% convergence
+    def converge(self, study, keys=('coarser', 'coarse', 'normal', 'fine', 'finer'), *,
+                 freq, num, mode='lr', tol=1e-3, expr="emw.freq", verbose=False):
+        """
+        Re-meshes and re-solves the eigenfrequency study for each predefined level in
+        keys (coarse to fine), until the largest relative change of the eigenfrequencies
+        drops below tol. Returns one report dict per level; the last one is the mesh in use.
+        verbose=True prints a line per level.
+        """
+        evaluator = eval_global_mixin(self._model, "sev_mesh")
+
+        report = []
+        f_prev = None
+        for key in keys:
+            self.auto(key)
+            self.finish()
+            study.solve_eigenfrequency(freq=freq, num=num, mode=mode)
+            f = np.sort(np.real(evaluator.evaluate([expr])[expr]))
+
+            delta = None
+            if (f_prev is not None) and (len(f) == len(f_prev)):
+                delta = float(np.max(np.abs(f - f_prev) / np.abs(f_prev)))
+
+            report.append({'level': key, 'elements': self.stats['elements'],
+                           'mesh_time': self.mesh_time, 'solve_time': study.solve_time,
+                           'freq': f, 'delta': delta, 'converged': (delta is not None) and (delta < tol)})
+            if verbose:
+                print(f"mesh {key:>16s}: {report[-1]['elements']:8d} elements, "
+                      f"mesh {self.mesh_time:6.1f}s, solve {study.solve_time:6.1f}s, delta {delta}")
+
+            if report[-1]['converged']:
+                break
+            f_prev = f
+        return report
@@ -13,6 +13,9 @@ class physics_mixin:
         self._phy = phy
         self._name = name
 
+    def lumped_index(self):
+        return self._phy.lumped_index()
+
     def show_options(self):
         print("ElectromagneticWaves", "Electrostatics")
 
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class result_mixin:
     def __init__(self, model, name="pg1", type="PlotGroup3D"):
         pg = model.result().create(name, type)
@@ -55,4 +58,57 @@ class result_mixin:
         _vol.set("colortable", "RainbowLight")
         _vol.set("colorscalemode", "logarithmic")
 
-        self._pg.run()
\ No newline at end of file
+        self._pg.run()
+
+class eval_global_mixin:
+    def __init__(self, model, name="sev1"):
+        numerical = model.result().numerical()
+        if name in numerical.tags():
+            ev = model.result().numerical(name)
+        else:
+            ev = numerical.create(name, "EvalGlobal")
+
+        self._model = model
+        self._ev = ev
+        self._name = name
+        self._settings = {}
+
+    def _setting(self, key, value):
+        """Sets a node property only when it changes; None restores the original value."""
+        if key not in self._settings:
+            if value is None:
+                return
+            self._settings[key] = (str(self._ev.getString(key)), None)
+
+        default, current = self._settings[key]
+        target = default if value is None else str(value)
+        if target != (current if current is not None else default):
+            self._ev.set(key, target)
+            self._settings[key] = (default, target)
+
+    def evaluate(self, exprs, data=None, outersolnum=None):
+        """
+        Evaluates all expressions in one round trip.
+        Returns a dict {expr: complex/real array over solutions}.
+        With outersolnum="all" the rows run over all outer (parametric)
+        solutions, each followed by its inner solutions.
+        """
+        if isinstance(exprs, str):
+            exprs = [exprs]
+        exprs = list(dict.fromkeys(exprs))
+
+        self._setting("data", data)
+        self._setting("outersolnum", outersolnum)
+        self._ev.set("expr", exprs)
+        data = np.array(self._ev.getReal(), dtype=float, ndmin=2)
+        if self._ev.isComplex():
+            data = data + 1j * np.array(self._ev.getImag(), dtype=float, ndmin=2)
+
+        # getReal()/getImag() are indexed [expression][solution]; store rows = solutions
+        if data.shape[0] != len(exprs):
+            raise RuntimeError(f"{self._name} returned {data.shape[0]} rows for {len(exprs)} expressions.")
+        data = data.T
+
+        self.exprs = exprs
+        self.data = data
+        return {_expr: data[:, _idx] for _idx, _expr in enumerate(exprs)}
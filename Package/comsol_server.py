@@ -0,0 +1,357 @@
+import os
+import sys
+import json
+import time
+import re
+import socket
+import platform
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+def platform_info(comsol_root):
+    """Resolves the COMSOL server executable and JVM library for this OS."""
+    current_os = platform.system()
+    is_mac = (current_os == "Darwin")
+    is_linux = (current_os == "Linux")
+
+    if is_mac:
+        arch = "macarm64" if platform.machine() == "arm64" else "maci64"
+    elif is_linux:
+        arch = "glnxa64"
+    else:
+        arch = "win64"
+
+    bin_path = os.path.join(comsol_root, "bin", arch)
+    if is_mac:
+        server_executable = os.path.join(bin_path, "comsol")
+        jvm_path = os.path.join(comsol_root, "java", arch, "jre", "Contents", "Home", "lib", "server", "libjvm.dylib")
+    elif is_linux:
+        server_executable = os.path.join(comsol_root, "bin", "comsol")
+        jvm_path = os.path.join(comsol_root, "java", arch, "jre", "lib", "server", "libjvm.so")
+    else:
+        server_executable = os.path.join(bin_path, "comsolmphserver.exe")
+        jvm_path = os.path.join(comsol_root, "java", arch, "jre", "bin", "server", "jvm.dll")
+
+    return {'os': current_os, 'arch': arch, 'bin_path': bin_path,
+            'server_executable': server_executable, 'jvm_path': jvm_path}
+
+
+def server_command(comsol_root, port, executable=None, cores=None, nodes=None):
+    """cores/nodes map to COMSOL's -np (cores per process) and -nn (number of processes)."""
+    options = []
+    if nodes is not None:
+        options += ['-nn', str(nodes)]
+    if cores is not None:
+        options += ['-np', str(cores)]
+
+    if executable is not None:
+        prefix = [executable] if isinstance(executable, str) else list(executable)
+        return prefix + ['-port', str(port)] + options
+
+    info = platform_info(comsol_root)
+    if info['os'] == "Windows":
+        return [info['server_executable']] + options + ['-port', str(port)]
+    return [info['server_executable']] + options + ['server', '-port', str(port)]
+
+
+def port_open(port, host="localhost", timeout=0.2):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def free_port(base_port=2036, used=()):
+    """First port from base_port on that nothing listens on (and is not in `used`)."""
+    port = base_port
+    while (port in used) or port_open(port):
+        port += 1
+    return port
+
+
+def pid_alive(pid):
+    if pid is None:
+        return False
+    if platform.system() == "Windows":
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, int(pid))
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+PORT_PATTERN = re.compile(r"listening on port\s+(\d+)")
+
+
+def read_port(stream):
+    """
+    Reads server output on a background thread and returns a Future resolving
+    to the reported port. The thread keeps draining the stream afterwards so
+    the server never blocks on a full pipe.
+    """
+    future = Future()
+
+    def reader():
+        for line in iter(stream.readline, ''):
+            if not future.done():
+                match = PORT_PATTERN.search(line)
+                if match:
+                    future.set_result(int(match.group(1)))
+        if not future.done():
+            future.set_exception(RuntimeError("COMSOL server exited before reporting its port."))
+
+    threading.Thread(target=reader, daemon=True).start()
+    return future
+
+
+def watch_log(log_path, process=None):
+    """Like read_port, for a server writing to a log file."""
+    future = Future()
+
+    def watcher():
+        pos, text = 0, ""
+        while not future.cancelled():
+            if os.path.exists(log_path):
+                with open(log_path, 'r', errors='ignore') as f:
+                    f.seek(pos)
+                    text += f.read()
+                    pos = f.tell()
+                match = PORT_PATTERN.search(text)
+                if match:
+                    future.set_result(int(match.group(1)))
+                    return
+            if (process is not None) and (process.poll() is not None):
+                future.set_exception(RuntimeError(f"COMSOL server exited before reporting its port (see {log_path})."))
+                return
+            time.sleep(0.05)
+
+    threading.Thread(target=watcher, daemon=True).start()
+    return future
+
+
+def wait_ready(port, timeout=30, host="localhost"):
+    """Polls the TCP port until the server accepts connections."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if port_open(port, host):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class ServerPool:
+    """
+    Pool of comsolmphserver processes on distinct ports, shared by all Python
+    processes on this machine through a JSON lock file.
+
+    Each entry records port, server pid, the pid of the process holding the
+    lease and the launch config (install, executable, cores, nodes); a pool only
+    counts and leases servers launched with its own config. Servers stay alive
+    after release, so the next client skips the launch and port scrape entirely.
+    """
+
+    def __init__(self, comsol_root=None, size=1, base_port=2036, lock_path=None, executable=None, timeout=30,
+                 cores=None, nodes=None):
+        """cores/nodes: -np/-nn of every server, e.g. size=4, cores=16 splits a 64-core node."""
+        self.comsol_root = comsol_root
+        self.size = size
+        self.base_port = base_port
+        self.executable = executable
+        self.timeout = timeout
+        self.cores = cores
+        self.nodes = nodes
+        self.config = {'comsol_root': os.path.abspath(comsol_root) if comsol_root else None,
+                       'executable': executable, 'cores': cores, 'nodes': nodes}
+
+        if lock_path is None:
+            lock_path = os.path.join(tempfile.gettempdir(), "qcdcomsol_servers.json")
+        self.lock_path = lock_path
+        self.log_dir = os.path.dirname(os.path.abspath(lock_path))
+
+    # =========================================================================
+    # Lock file
+    # =========================================================================
+    def _lock(self):
+        mutex = self.lock_path + ".lock"
+        start_time = time.time()
+        while True:
+            try:
+                fd = os.open(mutex, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return mutex
+            except FileExistsError:
+                # break locks left behind by crashed processes
+                try:
+                    if time.time() - os.path.getmtime(mutex) > 2*self.timeout:
+                        os.remove(mutex)
+                        continue
+                except OSError:
+                    pass
+                if time.time() - start_time > 4*self.timeout:
+                    raise TimeoutError(f"Could not lock server pool {self.lock_path}")
+                time.sleep(0.02)
+
+    def _unlock(self, mutex):
+        try:
+            os.remove(mutex)
+        except OSError:
+            pass
+
+    def _read(self):
+        try:
+            with open(self.lock_path, 'r') as f:
+                servers = json.load(f)['servers']
+        except (OSError, ValueError, KeyError):
+            servers = []
+        # drop servers that died since the last visit, free leases of dead owners
+        alive = []
+        for srv in servers:
+            if pid_alive(srv['pid']) and port_open(srv['port']):
+                if not pid_alive(srv.get('owner')):
+                    srv['owner'] = None
+                alive.append(srv)
+        return alive
+
+    def _write(self, servers):
+        tmp_path = self.lock_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'servers': servers}, f, indent=2)
+        os.replace(tmp_path, self.lock_path)
+
+    # =========================================================================
+    # Servers
+    # =========================================================================
+    def _launch(self, ports):
+        """Boots one server per port in parallel; returns their entries."""
+        kwargs = {}
+        if platform.system() == "Windows":
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+        else:
+            kwargs['start_new_session'] = True
+
+        booting = []
+        for port in ports:
+            log_path = os.path.join(self.log_dir, f"qcdcomsol_server_{port}.log")
+            cmd = server_command(self.comsol_root, port, self.executable, self.cores, self.nodes)
+            with open(log_path, 'w') as log:
+                process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                           env=os.environ.copy(), **kwargs)
+            booting.append((process, watch_log(log_path, process), log_path))
+
+        servers = []
+        deadline = time.time() + self.timeout
+        for process, future, log_path in booting:
+            try:
+                actual_port = future.result(timeout=max(deadline - time.time(), 0))
+            except (FutureTimeout, RuntimeError):
+                future.cancel()
+                process.kill()
+                raise RuntimeError(f"COMSOL server did not report a port within {self.timeout}s (see {log_path}).")
+            servers.append({'port': actual_port, 'pid': process.pid, 'owner': None, 'config': self.config})
+        return servers
+
+    def _new_ports(self, servers, count):
+        ports = []
+        used = {srv['port'] for srv in servers}
+        for _ in range(count):
+            ports.append(free_port(self.base_port, used | set(ports)))
+        return ports
+
+    def _mine(self, servers):
+        # JSON round trip turns tuples into lists, compare in the same form
+        config = json.loads(json.dumps(self.config))
+        return [srv for srv in servers if srv.get('config') == config]
+
+    def start(self):
+        """Launches servers until `size` with this config are alive; returns their entries."""
+        mutex = self._lock()
+        try:
+            servers = self._read()
+            mine = self._mine(servers)
+            new = self._launch(self._new_ports(servers, self.size - len(mine)))
+            self._write(servers + new)
+            return mine + new
+        finally:
+            self._unlock(mutex)
+
+    def acquire(self):
+        """Leases a free server with this pool's config to this process and returns its port."""
+        mutex = self._lock()
+        try:
+            servers = self._read()
+            mine = self._mine(servers)
+            free = [srv for srv in mine if srv['owner'] is None]
+            if free:
+                srv = free[0]
+            elif len(mine) < self.size:
+                srv = self._launch(self._new_ports(servers, 1))[0]
+                servers.append(srv)
+            else:
+                raise RuntimeError(f"All {self.size} COMSOL servers in {self.lock_path} are leased.")
+
+            srv['owner'] = os.getpid()
+            self._write(servers)
+            return srv['port']
+        finally:
+            self._unlock(mutex)
+
+    def release(self, port):
+        mutex = self._lock()
+        try:
+            servers = self._read()
+            for srv in servers:
+                if srv['port'] == port:
+                    srv['owner'] = None
+            self._write(servers)
+        finally:
+            self._unlock(mutex)
+
+    def shutdown(self):
+        """Stops only the servers launched with this pool's config."""
+        import signal
+
+        mutex = self._lock()
+        try:
+            servers = self._read()
+            mine = self._mine(servers)
+            for srv in mine:
+                try:
+                    if platform.system() == "Windows":
+                        subprocess.call(["taskkill", "/F", "/T", "/PID", str(srv['pid'])],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                    else:
+                        os.killpg(os.getpgid(srv['pid']), signal.SIGTERM)
+                except OSError:
+                    pass
+            self._write([srv for srv in servers if srv not in mine])
+        finally:
+            self._unlock(mutex)
+
+
+if __name__ == "__main__":
+    # ServerPool(size=2, executable=[sys.executable, __file__, "--stub"]) exercises the pool without COMSOL
+    if "--stub" in sys.argv:
+        port = int(sys.argv[sys.argv.index("-port") + 1])
+        sock = socket.socket()
+        # accepted connections are closed on our side, their TIME_WAIT must not block a restart on this port
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("localhost", port))
+        sock.listen()
+        print(f"COMSOL Multiphysics server listening on port {port}", flush=True)
+        while True:
+            sock.accept()[0].close()
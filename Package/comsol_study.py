@@ -1,3 +1,32 @@
+import time
+import numpy as np
+
+from comsol_result import eval_global_mixin
+
+
+SOLVER_PROFILES = {
+    # the sequence generated by createAutoSequences
+    'default': {},
+    # direct solvers: PARDISO is usually faster on one node, MUMPS scales across processes
+    'pardiso': {'solver': 'direct', 'linsolver': 'pardiso'},
+    'mumps': {'solver': 'direct', 'linsolver': 'mumps'},
+    # trades speed for memory on ~1M DOF models
+    'low_memory': {'solver': 'direct', 'linsolver': 'pardiso', 'out_of_core': True},
+    # Krylov + multigrid, lowest memory
+    'iterative': {'solver': 'iterative', 'linsolver': 'gmres'},
+}
+
+
+def solver_profile(profile):
+    if profile is None:
+        return {}
+    if isinstance(profile, str):
+        if profile not in SOLVER_PROFILES:
+            raise ValueError(f"Unknown solver profile '{profile}', choose from {list(SOLVER_PROFILES)}.")
+        return dict(SOLVER_PROFILES[profile])
+    return dict(profile)
+
+
 class study_mixin:
     def __init__(self, model, name):
         std = model.study().create(name)
@@ -6,26 +35,141 @@ class study_mixin:
         self._std = std
         self._std_name = name
 
-    def solve_eigenfrequency(self, *, freq, num, mode='lr'):
-        stp = self._std.feature().create('eig1', "Eigenfrequency")
-        stp.set("eigunit", "GHz")
-        stp.set('shift', str(freq/1e9))
-        stp.set('neigs', num)
-        stp.set('eigwhich', mode)
+    def solve_eigenfrequency(self, *, freq, num, mode='lr', profile=None, etol=None, shift_from=None):
+        """
+        Can be called again (e.g. after re-meshing); later calls update eig1 and re-solve sol1.
+        profile: name in SOLVER_PROFILES or a dict with solver ('direct'/'iterative'),
+        linsolver, out_of_core. etol: eigenvalue tolerance. Cores are set per server,
+        e.g. ServerPool(comsol_root, cores=16).
+        shift_from: eigenfrequencies of an earlier solve (e.g. eigenfrequencies() of the previous
+        design in a loop), the search starts from the lowest one instead of freq.
+        """
+        if shift_from is not None and len(shift_from):
+            freq = float(np.min(np.real(shift_from)))
+        settings = {'shift': str(freq/1e9), 'neigs': num, 'eigwhich': mode}
 
-        self._std.createAutoSequences("all")
+        if 'eig1' not in list(self._std.feature().tags()):
+            stp = self._std.feature().create('eig1', "Eigenfrequency")
+            stp.set("eigunit", "GHz")
+            for key, value in settings.items():
+                stp.set(key, value)
+            self._std.createAutoSequences("all")
+        else:
+            stp = self._std.feature('eig1')
+            for key, value in settings.items():
+                stp.set(key, value)
+                self._model.sol('sol1').feature('e1').set(key, value)
+
+        self._configure_solver(solver_profile(profile), etol)
+
+        start_time = time.perf_counter()
         self._model.sol('sol1').runAll()
+        self.solve_time = time.perf_counter() - start_time
+
+    def eigenfrequencies(self):
+        """Real parts of the eigenfrequencies of the last solve, in Hz."""
+        return np.real(eval_global_mixin(self._model, "sev_std").evaluate(["freq"])["freq"])
 
-    def param_sweep(self, var, rang):
-        stp = self._std.create("param", "Parametric")
-        stp.setIndex("pname", var, 0)
-        stp.setIndex("plistarr", " ".join(str(_x) for _x in rang), 0)
-        stp.setIndex("punit", "GHz", 0)
+    def _configure_solver(self, profile, etol=None):
+        """Applies a solver profile to the eigenvalue solver e1 of the generated sol1 sequence."""
+        e1 = self._model.sol('sol1').feature('e1')
+        if etol is not None:
+            e1.set("etol", etol)
 
+        if not profile.get('solver'):
+            return
+
+        # activate exactly one linear solver below e1, creating it if the sequence has none
+        kind = {'direct': "Direct", 'iterative': "Iterative"}[profile['solver']]
+        types = {_tag: str(e1.feature(_tag).getType()) for _tag in e1.feature().tags()}
+        solvers = {_tag: _type for _tag, _type in types.items() if _type in ("Direct", "Iterative")}
+        tag = next((_tag for _tag, _type in solvers.items() if _type == kind), None)
+        if tag is None:
+            tag = e1.feature().uniquetag(kind[0].lower())
+            e1.create(tag, kind)
+            if kind == "Iterative":
+                e1.feature(tag).create("mg1", "Multigrid")
+            solvers[tag] = kind
+
+        _lin = e1.feature(tag)
+        if profile.get('linsolver'):
+            _lin.set("linsolver", profile['linsolver'])
+        if kind == "Direct":
+            _lin.set("ooc", bool(profile.get('out_of_core', False)))
+
+        for _tag in solvers:
+            e1.feature(_tag).active(_tag == tag)
+
+    def param_sweep(self, var, rang, unit="", *, sweeptype="filled", reuse=False, keep_in_memory=True,
+                    store_to_file=None, distribute=False):
+        """
+        Parametric sweep run server-side as one batch job.
+        var/rang/unit: one parameter, or lists of names, value lists and units ("" = the
+        parameter's own unit). sweeptype: "filled" runs all combinations, "sparse" the
+        given combinations (value lists of equal length).
+        reuse: start each point from the previous solution. keep_in_memory=False keeps only
+        the last solution in the model; store_to_file writes each point's model to that path.
+        distribute: let COMSOL split the points over the processes of a server started
+        with -nn (ServerPool(nodes=...)); results arrive in the same dataset.
+        Tags are unique, so the method can be called repeatedly; earlier sweeps of this study
+        are deactivated (their datasets stay) so they are not re-run as an outer loop.
+        Returns the result dataset.
+        """
+        if isinstance(var, str):
+            var, rang, unit = [var], [rang], [unit]
+        elif isinstance(unit, str):
+            unit = [unit] * len(var)
+        rang = [list(_r) for _r in rang]
+
+        if sweeptype == "filled":
+            self.sweep_size = int(np.prod([len(_r) for _r in rang]))
+        elif sweeptype == "sparse":
+            if len({len(_r) for _r in rang}) != 1:
+                raise ValueError("sparse sweeps need value lists of equal length.")
+            self.sweep_size = len(rang[0])
+        else:
+            raise ValueError(f"Unknown sweeptype '{sweeptype}', use 'filled' or 'sparse'.")
+
+        # several Parametric features in one study form a nested sweep: keep only the new one
+        for _tag in list(self._std.feature().tags()):
+            if str(self._std.feature(_tag).getType()) == "Parametric":
+                self._std.feature(_tag).active(False)
+        # the old batch job is regenerated by createAutoSequences; its solutions stay in their psol
+        if getattr(self, 'sweep_tags', None) and (self.sweep_tags['batch'] in list(self._model.batch().tags())):
+            self._model.batch().remove(self.sweep_tags['batch'])
+
+        stp = self._std.feature().create(self._std.feature().uniquetag("param"), "Parametric")
+        stp.set("sweeptype", sweeptype)
+        for _idx, (_var, _rang, _unit) in enumerate(zip(var, rang, unit)):
+            stp.setIndex("pname", _var, _idx)
+            stp.setIndex("plistarr", " ".join(str(_x) for _x in _rang), _idx)
+            stp.setIndex("punit", _unit, _idx)
+
+        stp.set("preusesol", "yes" if reuse else "no")
+        stp.set("pdistrib", distribute)
+        stp.set("keepsol", "all" if keep_in_memory else "last")
+        if store_to_file is not None:
+            stp.set("save", True)
+            stp.set("filename", store_to_file)
+
+        # the generated batch job is the one that did not exist before
+        batches = set(self._model.batch().tags())
+        datasets = set(self._model.result().dataset().tags())
         self._std.createAutoSequences("all")
-        sol2 = self._model.sol().create("sol2")
-        sol2.study("std1")
-        sol2.label("Parametric Solutions 1")
+        batch = next((_tag for _tag in self._model.batch().tags() if _tag not in batches), None)
+        if batch is None:
+            raise RuntimeError(f"createAutoSequences did not generate a batch job for {stp.tag()} in "
+                               f"{self._std_name}; existing jobs: {sorted(batches)}.")
+
+        sol_tag = self._model.sol().uniquetag("sol")
+        sol = self._model.sol().create(sol_tag)
+        sol.study(self._std_name)
+        sol.label("Parametric Solutions " + stp.tag())
+
+        self._model.batch(batch).feature("so1").set("psol", sol_tag)
+        self._model.batch(batch).run("compute")
 
-        self._model.batch("p1").feature("so1").set("psol", "sol2")
-        self._model.batch("p1").run("compute")
\ No newline at end of file
+        new_datasets = [_tag for _tag in self._model.result().dataset().tags() if _tag not in datasets]
+        self.sweep_tags = {'param': stp.tag(), 'sol': sol_tag, 'batch': batch}
+        self.sweep_data = new_datasets[-1] if new_datasets else None
+        return self.sweep_data
@@ -0,0 +1,184 @@
+import os
+import copy
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from comsol_server import ServerPool
+
+# Per-process state of a sweep worker (JPype allows one JVM per process)
+_worker = {}
+
+
+def _default_client(comsol_root, pool):
+    from comsol_client import ComsolClient
+    return ComsolClient(comsol_root, pool=pool)
+
+
+def _init_worker(client_factory, comsol_root, pool):
+    # no disconnect at exit (atexit does not run in pool workers): the server lease
+    # of a finished worker is freed when the pool prunes dead owner pids
+    _worker['client'] = client_factory(comsol_root, pool)
+
+
+def _run_point(builder, index, params):
+    return builder(_worker['client'], **params)
+
+
+# servers started when no pool is given; each gets an equal share of the cores
+DEFAULT_WORKERS = 4
+
+
+def _cores_per_server(servers):
+    return max(1, (os.cpu_count() or 1) // servers)
+
+
+class SweepRunner:
+    """
+    Runs a design builder over a parameter grid on a pool of worker processes.
+    Every worker owns one ComsolClient on its own server (leased from `pool`;
+    without one, a ServerPool with one server per worker and cores split evenly).
+
+    builder(client, **params) builds/solves one design and returns a picklable result.
+    grid: {name: values} for all combinations, or a list of {name: value} dicts.
+    comsol_root may be None only with a pool or a custom client_factory.
+    """
+
+    def __init__(self, builder, grid, *, comsol_root, pool=None, workers=None, retries=1,
+                 client_factory=_default_client):
+        self.builder = builder
+        self.points = self._expand(grid)
+        self.comsol_root = comsol_root
+        self.retries = retries
+        self.client_factory = client_factory
+
+        if workers is None:
+            workers = pool.size if pool is not None else DEFAULT_WORKERS
+        self.workers = max(1, min(workers, len(self.points)))
+        if (pool is not None) and (self.workers > pool.size):
+            raise ValueError(f"{self.workers} workers need {self.workers} servers, the pool has {pool.size}.")
+
+        if (pool is None) and (client_factory is _default_client):
+            if comsol_root is None:
+                raise ValueError("comsol_root is needed to start COMSOL servers (or pass a pool).")
+            pool = ServerPool(comsol_root, size=self.workers, cores=_cores_per_server(self.workers))
+        self.pool = pool
+
+    @staticmethod
+    def _expand(grid):
+        if isinstance(grid, dict):
+            names = list(grid)
+            return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+        return [dict(point) for point in grid]
+
+    def iter_results(self):
+        """
+        Yields (index, params, result) as points finish; result is the exception if all retries failed.
+        A worker that dies (e.g. a JVM crash) breaks the whole executor: it is restarted for
+        the unfinished points, each of which counts one attempt.
+        """
+        if self.pool is not None:
+            self.pool.start()
+
+        attempts = {index: 0 for index in range(len(self.points))}
+        while attempts:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.client_factory, self.comsol_root, self.pool)) as executor:
+                pending = {executor.submit(_run_point, self.builder, index, self.points[index]): index
+                           for index in attempts}
+                try:
+                    while pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            index = pending.pop(future)
+                            params = self.points[index]
+                            try:
+                                result = future.result()
+                            except BrokenProcessPool:
+                                raise
+                            except Exception as err:
+                                if attempts[index] < self.retries:
+                                    attempts[index] += 1
+                                    pending[executor.submit(_run_point, self.builder, index, params)] = index
+                                    continue
+                                result = err
+                            del attempts[index]
+                            yield index, params, result
+                except BrokenProcessPool as err:
+                    for index in sorted(attempts):
+                        attempts[index] += 1
+                        if attempts[index] > self.retries:
+                            del attempts[index]
+                            yield index, self.points[index], err
+
+    def run(self):
+        """Returns the results in grid order."""
+        results = [None] * len(self.points)
+        for index, _, result in self.iter_results():
+            results[index] = result
+        return results
+
+
+#%% one parametric sweep split over K servers
+def split_sweep(var, rang, slices, sweeptype="filled"):
+    """
+    Splits a (filled or sparse) parametric sweep into at most `slices` contiguous
+    sparse sweeps; concatenating their results gives the original point order.
+    """
+    if isinstance(var, str):
+        var, rang = [var], [rang]
+    if sweeptype == "filled":
+        points = list(itertools.product(*rang))
+    else:
+        points = list(zip(*rang))
+
+    chunks = [_c for _c in np.array_split(np.arange(len(points)), min(slices, len(points))) if len(_c)]
+    return [[list(_v) for _v in zip(*[points[_i] for _i in _c])] for _c in chunks]
+
+
+def concat_results(results):
+    """Joins per-slice results along the leading (sweep) axis: arrays, dicts or result objects."""
+    first = results[0]
+    if isinstance(first, np.ndarray):
+        return np.concatenate(results, axis=0)
+    if isinstance(first, dict):
+        return {_k: concat_results([_r[_k] for _r in results]) for _k in first}
+    if isinstance(first, (list, tuple)):
+        return [_x for _r in results for _x in _r]
+
+    joined = copy.copy(first)
+    for _k, _v in vars(first).items():
+        if isinstance(_v, np.ndarray):
+            setattr(joined, _k, np.concatenate([getattr(_r, _k) for _r in results], axis=0))
+    return joined
+
+
+def distributed_sweep(builder, var, rang, unit="", *, slices, comsol_root, sweeptype="filled", pool=None,
+                      retries=1, client_factory=_default_client, **kwargs):
+    """
+    Runs one parametric sweep as `slices` sparse sub-sweeps on separate servers
+    (e.g. ServerPool(size=4, cores=16); without a pool, cpu_count//slices cores
+    per server) and returns the joined result.
+
+    builder(client, var=..., rang=..., unit=..., sweeptype="sparse", **kwargs) builds the
+    model, runs study_mixin.param_sweep on its slice and returns a result with the
+    sweep as leading axis (e.g. EPR_mixin.sweep).
+    """
+    if (pool is not None) and (slices > pool.size):
+        raise ValueError(f"slices={slices} needs one server per slice, the pool has size={pool.size}.")
+    if isinstance(var, str):
+        var, rang = [var], [rang]
+    grid = [dict(kwargs, var=var, rang=_rang, unit=unit, sweeptype="sparse")
+            for _rang in split_sweep(var, rang, slices, sweeptype)]
+    if (pool is None) and (client_factory is _default_client):
+        # one server per slice, the cores shared out between them
+        pool = ServerPool(comsol_root, size=len(grid), cores=_cores_per_server(len(grid)))
+    runner = SweepRunner(builder, grid, comsol_root=comsol_root, pool=pool, workers=len(grid),
+                         retries=retries, client_factory=client_factory)
+
+    results = runner.run()
+    for _r in results:
+        if isinstance(_r, Exception):
+            raise _r
+    return concat_results(results)
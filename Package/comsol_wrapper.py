@@ -7,12 +7,36 @@ class JavaWrapper:
     Core wrapper class for COMSOL objects.
     Preserves specific type conversion logic and smart node navigation.
     """
+    # (python type of the Java object, attribute name) -> (kind, java name)
+    _dispatch = {}
 
-    def __init__(self, java_model, mph_name="model", comsol_client=None):
+    # Java methods that resolve a child node from its tag (cached per model)
+    _child_accessors = {"modelNode", "component", "study", "result", "param", "sol", "geom", "material",
+                        "physics", "mesh", "view", "feature", "selection", "propertyGroup", "numerical", "dataset"}
+    # Java methods that change the node tree (invalidate the per-model cache)
+    _tree_mutators = {"create", "remove", "clear", "rename", "duplicate", "move"}
+    # Java methods that may add or replace nodes server-side (sol1, datasets, selections): clear the cache
+    _node_creators = {"createAutoSequences", "load", "importData"}
+
+    # exact Python type -> Java scalar; element-type signature -> Java array converter
+    _scalar_converters = {bool: jpype.JBoolean, int: jpype.JInt, float: jpype.JDouble, str: jpype.JString}
+    _list_converters = {}
+
+    # python type of a Java result -> how _auto_wrap converts it
+    _wrap_kinds = {}
+
+    def __init__(self, java_model, mph_name="model", comsol_client=None, cache=None, key=()):
         # Use __dict__ to set attributes to avoid infinite recursion in __getattr__
         self.__dict__['_java_model'] = java_model
         self.__dict__['_mph_name'] = mph_name
         self.__dict__['_comsol_client'] = comsol_client
+        # Per-model cache shared by all wrappers of one model; key = navigation path from the model
+        self.__dict__['_cache'] = cache if cache is not None else {'nodes': {}}
+        self.__dict__['_key'] = key
+
+    def _child(self, java_child, step):
+        key = self._key + (step,) if self._key is not None else None
+        return JavaWrapper(java_child, self._mph_name, self._comsol_client, self._cache, key)
 
     # =========================================================================
     # 1. Core Logic: Attribute Dispatch & Navigation
@@ -24,11 +48,38 @@ class JavaWrapper:
         2. Special naming corrections (e.g., param -> varnames)
         3. Native Java methods/attributes (with auto type conversion)
         4. COMSOL Child Node Navigation (smart search based on node type)
+        The decision is cached per Java class; bound methods are cached per wrapper.
         """
 
-        # Priority 0: Check if the method exists locally in Python
+        java_model = self.__dict__.get('_java_model')
+        if java_model is None:
+            raise AttributeError(name)
+        key = (type(java_model), name)
+        entry = JavaWrapper._dispatch.get(key)
+        if entry is None:
+            entry = self._resolve_dispatch(name)
+            JavaWrapper._dispatch[key] = entry
+        kind, java_name = entry
+
+        # Priority 0: Local methods defined in this class
+        if kind == 'local':
+            return object.__getattribute__(self, name)
+
+        # Priority 2: Native Java Access
+        if kind == 'method':
+            bound = self._bind(getattr(java_model, java_name), java_name)
+            self.__dict__[name] = bound
+            return bound
+        if kind == 'field':
+            return self._auto_wrap(getattr(java_model, java_name))
+
+        # Priority 3: Smart Child Node Navigation
+        return self._navigate(name)
+
+    def _resolve_dispatch(self, name):
+        """Classifies `name` for this Java class: ('local'|'method'|'field'|'child', java_name)."""
         if hasattr(self.__class__, name):
-            return getattr(self, name)
+            return 'local', name
 
         class_simple_name = self._get_java_type()
 
@@ -36,31 +87,81 @@ class JavaWrapper:
         if name == "param" and class_simple_name == "ModelParamClient":
             name = "varnames"
 
-        # Priority 2: Native Java Access
         if hasattr(self._java_model, name):
-            java_attr = getattr(self._java_model, name)
-
-            if callable(java_attr):
-                def hooked(*args, **kwargs):
-                    new_args = self._convert_args(args)
-                    result = java_attr(*new_args, **kwargs)
-                    return self._auto_wrap(result)
-
-                return hooked
+            kind = 'method' if callable(getattr(self._java_model, name)) else 'field'
+            return kind, name
+        return 'child', name
+
+    def _bind(self, java_attr, java_name):
+        nodes = self._cache['nodes']
+
+        if java_name in JavaWrapper._tree_mutators:
+            def hooked(*args, **kwargs):
+                nodes.clear()
+                new_args = self._convert_args(args)
+                result = java_attr(*new_args, **kwargs)
+                # create(tag, ...) is keyed like feature(tag), so its subtree uses the cache
+                if (java_name == "create") and args and isinstance(args[0], str):
+                    return self._auto_wrap(result, (java_name, args[0]))
+                return self._auto_wrap(result)
+
+        elif (java_name in JavaWrapper._node_creators) or java_name.startswith("run"):
+            def hooked(*args, **kwargs):
+                new_args = self._convert_args(args)
+                result = java_attr(*new_args, **kwargs)
+                # load()/importData() can also replace existing nodes, drop every cached wrapper
+                nodes.clear()
+                return self._auto_wrap(result)
+
+        elif (java_name in JavaWrapper._child_accessors) and (self._key is not None):
+            def hooked(*args, **kwargs):
+                # e.g. model.modelNode("comp1"): resolve each tag once per model
+                if (len(args) == 1) and (not kwargs) and isinstance(args[0], str):
+                    step = (java_name, args[0])
+                    child = nodes.get((self._key, step))
+                    if child is None:
+                        child = self._auto_wrap(java_attr(*self._convert_args(args)), step)
+                        if isinstance(child, JavaWrapper):
+                            nodes[(self._key, step)] = child
+                    return child
+
+                new_args = self._convert_args(args)
+                result = java_attr(*new_args, **kwargs)
+                # e.g. comp.geom(): the list node, keyed so create()/feature() below it are too
+                return self._auto_wrap(result, (java_name,) if not (args or kwargs) else None)
+
+        else:
+            def hooked(*args, **kwargs):
+                new_args = self._convert_args(args)
+                result = java_attr(*new_args, **kwargs)
+                return self._auto_wrap(result)
+
+        return hooked
+
+    def _navigate(self, name):
+        class_simple_name = self._get_java_type()
 
-            return self._auto_wrap(java_attr)
+        # Resolved children and failed probes are both remembered per model
+        nodes = self._cache['nodes'] if self._key is not None else {}
+        hit = nodes.get((self._key, name), False)
+        if hit is None:
+            raise AttributeError(f"Attribute '{name}' not found in {self.tag()} ({class_simple_name})")
+        if hit:
+            return hit
 
-        # Priority 3: Smart Child Node Navigation
         accessors = self._get_allowed_accessors(class_simple_name)
         for method in accessors:
             try:
                 accessor = getattr(self._java_model, method)
                 child = accessor(name)
                 if child is not None:
-                    return JavaWrapper(child, self._mph_name, self._comsol_client)
+                    child = self._child(child, (method, name))
+                    nodes[(self._key, name)] = child
+                    return child
             except:
                 continue
 
+        nodes[(self._key, name)] = None
         raise AttributeError(f"Attribute '{name}' not found in {self.tag()} ({class_simple_name})")
 
     def _get_allowed_accessors(self, class_name):
@@ -80,38 +181,35 @@ class JavaWrapper:
         """
         Converts Python arguments to specific Java types (JArray, JInt, etc.)
         FIX: Now checks for mixed types (Int/Float) to prevent crashes.
+        Lists/tuples are dispatched on their element-type signature (cached) and
+        NumPy arrays are bulk-copied into double[], int[], double[][], String[], ...
         """
         new_args = []
         for arg in args:
+            conv = JavaWrapper._scalar_converters.get(type(arg))
+            if conv is not None:
+                new_args.append(conv(arg))
+
             # Handle Lists/Tuples -> Java Arrays
-            if isinstance(arg, (list, tuple)):
+            elif isinstance(arg, (list, tuple)):
                 if not arg:
                     new_args.append(arg)
                     continue
 
-                # FIX: Check if ANY element is a float/numpy.float.
-                # If so, we must treat the whole array as Double, even if arg[0] is int.
-                has_float = any(isinstance(x, (float, np.floating)) for x in arg)
-
-                first = arg[0]
-
-                if isinstance(first, bool):
-                    new_args.append(jpype.JArray(jpype.JBoolean)(arg))
-                elif has_float:
-                    # Promote mixed arrays (e.g. [0, 0, 1.5]) to Double Array
-                    new_args.append(jpype.JArray(jpype.JDouble)(arg))
-                elif isinstance(first, int):
-                    # Only use Int Array if NO floats are present
-                    new_args.append(jpype.JArray(jpype.JInt)(arg))
-                elif isinstance(first, str):
-                    new_args.append(jpype.JArray(jpype.JString)(arg))
-                else:
-                    new_args.append(arg)
+                sig = (type(arg[0]), frozenset(map(type, arg)))
+                conv = JavaWrapper._list_converters.get(sig)
+                if conv is None:
+                    conv = self._list_converter(*sig)
+                    JavaWrapper._list_converters[sig] = conv
+                new_args.append(conv(arg))
+
+            elif isinstance(arg, np.ndarray):
+                new_args.append(self._convert_ndarray(arg))
 
             # Handle Basic Primitives -> Java Types
             elif isinstance(arg, bool):
                 new_args.append(jpype.JBoolean(arg))
-            elif isinstance(arg, int):
+            elif isinstance(arg, (int, np.integer)):
                 new_args.append(jpype.JInt(arg))
             elif isinstance(arg, float):
                 new_args.append(jpype.JDouble(arg))
@@ -121,25 +219,108 @@ class JavaWrapper:
                 new_args.append(arg)
         return tuple(new_args)
 
-    def _auto_wrap(self, result):
-        """Recursively wraps the result from Java."""
+    @staticmethod
+    def _list_converter(first, types):
+        """Picks the Java array type for a list from its first element and element types."""
+        if issubclass(first, bool):
+            return lambda arg: jpype.JArray(jpype.JBoolean)(arg)
+        if any(issubclass(t, str) for t in types):
+            # expressions mixed with numbers, e.g. [w, "h_chip", 1e-3]
+            return lambda arg: jpype.JArray(jpype.JString)([str(x) for x in arg])
+        if any(issubclass(t, (float, np.floating)) for t in types):
+            # Promote mixed arrays (e.g. [0, 0, 1.5]) to Double Array, bulk copy through a buffer
+            return lambda arg: jpype.JArray.of(np.asarray(arg, dtype=np.float64))
+        if issubclass(first, int):
+            # Only use Int Array if NO floats are present
+            return lambda arg: jpype.JArray.of(np.asarray(arg, dtype=np.int32))
+        return lambda arg: arg
+
+    @staticmethod
+    def _convert_ndarray(arg):
+        kind = arg.dtype.kind
+        if kind == 'f':
+            return jpype.JArray.of(np.ascontiguousarray(arg, dtype=np.float64))
+        if kind in 'iu':
+            # same as the list path: refuse values int[] cannot hold instead of wrapping them
+            info = np.iinfo(np.int32)
+            if arg.size and ((arg.min() < info.min) or (arg.max() > info.max)):
+                raise OverflowError(f"Array values out of int32 range [{arg.min()}, {arg.max()}].")
+            return jpype.JArray.of(np.ascontiguousarray(arg, dtype=np.int32))
+        if kind == 'b':
+            return jpype.JArray.of(np.ascontiguousarray(arg, dtype=np.bool_))
+        if kind in 'USO':
+            return jpype.JArray(jpype.JString, max(arg.ndim, 1))(arg.astype(str).tolist())
+        return arg
+
+    def _auto_wrap(self, result, step=None):
+        """Recursively wraps the result from Java; `step` extends the navigation path of a child node."""
         if result is None:
             return None
 
-        if hasattr(result, 'getClass'):
-            java_class_name = str(result.getClass().getName())
+        # Result handling is decided once per Java class (one getClass() per class, not per value)
+        kind = JavaWrapper._wrap_kinds.get(type(result))
+        if kind is None:
+            kind = self._wrap_kind(result)
+            JavaWrapper._wrap_kinds[type(result)] = kind
+
+        if kind == 'plain':
+            return result
+
+        if kind == 'primitive_array':
+            return self._primitive_to_numpy(result)
 
-            if java_class_name.startswith('['):
-                return [self._auto_wrap(x) for x in result]
+        if kind == 'comsol_array':
+            return [JavaWrapper(x, self._mph_name, self._comsol_client, self._cache, None) for x in result]
 
-            if "com.comsol" in java_class_name:
-                return JavaWrapper(result, self._mph_name, self._comsol_client)
+        if kind == 'array':
+            return [self._auto_wrap(x) for x in result]
 
-            if java_class_name.startswith('java.lang.'):
-                return self._final_unwrap(result)
+        if kind == 'comsol':
+            if step is None:
+                return JavaWrapper(result, self._mph_name, self._comsol_client, self._cache, None)
+            return self._child(result, step)
+
+        if kind == 'lang':
+            return self._final_unwrap(result)
 
         return result
 
+    @staticmethod
+    def _wrap_kind(result):
+        if not hasattr(result, 'getClass'):
+            return 'plain'
+
+        java_class_name = str(result.getClass().getName())
+
+        if java_class_name.startswith('['):
+            element = java_class_name.lstrip('[')
+            if len(element) == 1:
+                # double[], double[][], int[], float[], ...
+                return 'primitive_array'
+            if element.startswith('Lcom.comsol') and java_class_name.startswith('[L'):
+                return 'comsol_array'
+            return 'array'
+
+        if "com.comsol" in java_class_name:
+            return 'comsol'
+
+        if java_class_name.startswith('java.lang.'):
+            return 'lang'
+
+        return 'other'
+
+    @staticmethod
+    def _primitive_to_numpy(result):
+        """Single bulk copy through JPype's buffer support; row-wise fallback for jagged arrays."""
+        try:
+            return np.array(memoryview(result))
+        except (TypeError, ValueError, BufferError):
+            rows = [JavaWrapper._primitive_to_numpy(row) for row in result]
+            try:
+                return np.array(rows)
+            except ValueError:
+                return rows
+
     def _final_unwrap(self, item):
         """Converts Java wrapper types to Python primitives."""
         try:
@@ -156,10 +337,14 @@ class JavaWrapper:
     # 3. Utility Methods (Information & File IO)
     # =========================================================================
     def _get_java_type(self):
-        try:
-            return self._java_model.getClass().getSimpleName()
-        except:
-            return "Unknown"
+        java_type = self.__dict__.get('_java_type')
+        if java_type is None:
+            try:
+                java_type = str(self._java_model.getClass().getSimpleName())
+            except:
+                java_type = "Unknown"
+            self.__dict__['_java_type'] = java_type
+        return java_type
 
     def tag(self):
         try:
@@ -167,6 +352,49 @@ class JavaWrapper:
         except:
             return "NoTag"
 
+    def lumped_index(self, phys="emw", comp="comp1"):
+        """
+        Lists LumpedPort / LumpedElement features of a physics node in one pass.
+        Returns {'ports': {num: tag}, 'junctions': {num: tag}}, numbered as the
+        emw.Pport_<num> / emw.Ielement_<num> variables; junctions are the Inductor elements.
+        """
+        node = self._java_model
+        class_simple_name = self._get_java_type()
+        if ("Model" in class_simple_name) and ("ModelNode" not in class_simple_name):
+            node = node.modelNode(comp).physics(phys)
+
+        index = {'ports': {}, 'junctions': {}}
+        unnamed_ports = []
+        num_element = 0
+        for feat in node.feature():
+            # disabled features define no Pport/Ielement variables
+            if not feat.isActive():
+                continue
+            feat_type = str(feat.getType())
+            if feat_type == "LumpedPort":
+                try:
+                    num_port = int(str(feat.getString("PortName")))
+                except:
+                    unnamed_ports.append(str(feat.tag()))
+                    continue
+                index['ports'][num_port] = str(feat.tag())
+            elif feat_type == "LumpedElement":
+                # Ielement_<num> counts all lumped elements, only inductors are junctions
+                num_element += 1
+                if str(feat.getString("LumpedElementType")) == "Inductor":
+                    index['junctions'][num_element] = str(feat.tag())
+
+        # ports without a numeric name take the lowest numbers no named port uses
+        num_port = 0
+        for tag in unnamed_ports:
+            num_port += 1
+            while num_port in index['ports']:
+                num_port += 1
+            index['ports'][num_port] = tag
+
+        index['ports'] = dict(sorted(index['ports'].items()))
+        return index
+
     def save(self, filename=None):
         target = filename if filename else (self._mph_name + '.mph')
         print(f"Saving to {target}...")
@@ -192,4 +420,4 @@ class JavaWrapper:
             connector = "└── " if i == len(children) - 1 else "├── "
             print(f"{prefix}{connector}[{m}] {child.tag()} ({child._get_java_type()})")
             next_prefix = prefix + ("    " if i == len(children) - 1 else "│   ")
-            self._print_recursive(child, next_prefix, depth + 1, max_depth)
\ No newline at end of file
+            self._print_recursive(child, next_prefix, depth + 1, max_depth)
@@ -0,0 +1,110 @@
+import numpy as np
+import scipy.constants as con
+
+phi0 = con.value('mag. flux quantum')/(2*con.pi)
+
+# All functions accept arrays with arbitrary leading (batch) axes, e.g. a
+# parametric sweep stacked as (sweep, modes, junctions).
+
+
+def josephson_energy(LJ):
+    """EJ = phi0^2 / LJ, shape (..., junctions)."""
+    return (phi0**2) / np.asarray(LJ, dtype=float)
+
+
+def participation(I, LJ, We):
+    """
+    Signed junction participation, normalized over modes per junction.
+    I: (..., modes, junctions) complex currents, LJ: (..., junctions), We: (..., modes)
+    Returns p with shape (..., modes, junctions).
+    """
+    I = np.asarray(I)
+    LJ = np.asarray(LJ, dtype=float)[..., np.newaxis, :]
+    We = np.asarray(We, dtype=float)[..., np.newaxis]
+
+    p = np.sign(np.imag(I)) * (np.abs(I) ** 2) * LJ / (4*We)
+    return p / np.sum(np.abs(p), axis=-2, keepdims=True)
+
+
+def chi_matrix(f, p, EJ):
+    """
+    Kerr coupling chi_mn = h/4 f_m f_n sum_j |p_mj||p_nj|/EJ_j.
+    f: (..., modes), p: (..., modes, junctions), EJ: (..., junctions)
+    Returns (..., modes, modes).
+    """
+    f = np.asarray(f, dtype=float)
+    p_abs = np.abs(p)
+    EJ = np.asarray(EJ, dtype=float)[..., np.newaxis, :]
+
+    chi = np.einsum('...mj,...nj->...mn', p_abs / EJ, p_abs)
+    return (con.h/4) * chi * f[..., :, np.newaxis] * f[..., np.newaxis, :]
+
+
+def lamb_shift(chi):
+    return (1/2) * np.sum(chi, axis=-1)
+
+
+def anharmonicity(chi):
+    return (1/2) * np.diagonal(chi, axis1=-2, axis2=-1)
+
+
+def q_matrix(f, P_port, We, Wm):
+    """
+    Per-port quality factors.
+    f, We, Wm: (..., modes), P_port: (..., modes, ports). Returns (..., modes, ports).
+    """
+    f = np.asarray(f, dtype=float)[..., np.newaxis]
+    W = (np.asarray(We, dtype=float) + np.asarray(Wm, dtype=float))[..., np.newaxis]
+
+    kappa = -np.asarray(P_port, dtype=float) / W
+    return (2*np.pi*f) / kappa
+
+
+def analyze(f, I, LJ, We):
+    """Returns (p, chi, Delta, Alpha) for (possibly batched) EPR data."""
+    p = participation(I, LJ, We)
+    chi = chi_matrix(f, p, josephson_energy(LJ))
+    return p, chi, lamb_shift(chi), anharmonicity(chi)
+
+
+#%% benchmark against the original per-mode loop
+def _loop_reference(f_list, I_mat, LJ_list, We):
+    EJ_list = (phi0**2)/LJ_list
+
+    p_mat = []
+    for num_JJ in range(len(LJ_list)):
+        val_I = I_mat[:, num_JJ]
+        val_p = np.sign(np.imag(val_I)) * (np.abs(val_I) ** 2) * LJ_list[num_JJ] / (4*We)
+        p_mat.append(val_p/np.sum(np.abs(val_p)))
+    p_mat = np.array(p_mat)
+
+    Chi_mat = np.zeros((len(f_list), len(f_list)))
+    for num_1 in range(len(f_list)):
+        for num_2 in range(len(f_list)):
+            Chi_mat[num_1, num_2] = (con.h/4) * f_list[num_1] * f_list[num_2] * np.sum(np.abs(p_mat[:, num_1]) * np.abs(p_mat[:, num_2])/EJ_list)
+
+    return p_mat.T, Chi_mat
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n_sweep, n_modes, n_JJ = 200, 20, 4
+
+    f = rng.uniform(3e9, 9e9, (n_sweep, n_modes))
+    I = rng.normal(size=(n_sweep, n_modes, n_JJ)) + 1j*rng.normal(size=(n_sweep, n_modes, n_JJ))
+    LJ = rng.uniform(5e-9, 15e-9, (n_sweep, n_JJ))
+    We = rng.uniform(1e-20, 1e-19, (n_sweep, n_modes))
+
+    t0 = time.perf_counter()
+    ref = [_loop_reference(f[k], I[k], LJ[k], We[k]) for k in range(n_sweep)]
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    p, chi, Delta, Alpha = analyze(f, I, LJ, We)
+    t_vec = time.perf_counter() - t0
+
+    assert np.allclose(p, [r[0] for r in ref])
+    assert np.allclose(chi, [r[1] for r in ref])
+    print(f"loop: {t_loop*1e3:.1f} ms, vectorized: {t_vec*1e3:.1f} ms, speed-up x{t_loop/t_vec:.0f}")
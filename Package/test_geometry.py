@@ -0,0 +1,153 @@
+import numpy as np
+
+from comsol_geometry import geometry_mixin, Cylinder, Difference
+
+
+#%% recording fake of the COMSOL geometry API
+class _Node:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: _Node()
+
+    def set(self, *args):
+        self.calls.append(args)
+
+
+class _Features:
+    def __init__(self, geom):
+        self._geom = geom
+
+    def create(self, tag, kind):
+        self._geom.order.append(tag)
+        self._geom.nodes[tag] = _Node()
+        return self._geom.nodes[tag]
+
+    def remove(self, tag):
+        self._geom.order.remove(tag)
+
+    def move(self, tag, idx):
+        self._geom.order.remove(tag)
+        self._geom.order.insert(idx, tag)
+
+    def tags(self):
+        return list(self._geom.order)
+
+
+class _Geom:
+    def __init__(self):
+        self.order = []
+        self.nodes = {}
+        self.runs = []
+
+    def feature(self, tag=None):
+        return _Features(self) if tag is None else self.nodes[tag]
+
+    def run(self, name=None):
+        self.runs.append(name)
+
+
+class _Comp:
+    def __init__(self):
+        self.geom1 = _Geom()
+
+    def geom(self):
+        return self
+
+    def create(self, name, dim):
+        return self.geom1
+
+    def view(self, name):
+        return _Node()
+
+    def selection(self, *args):
+        return _Node()
+
+
+class _Model:
+    def __init__(self):
+        self.comp1 = _Comp()
+        self.params = _Node()
+
+    def modelNode(self, name):
+        return self.comp1
+
+    def param(self):
+        return self.params
+
+
+def _wavepool(geom):
+    geom.new_cylinder(name="cyl_cavity", r=4.5e-3, l=10e-3)
+    geom.new_cylinder(name="cyl_stub", r=1e-3, l=8e-3)
+    geom.new_block(name="blk_tube", w=2e-3, h=2e-3, l=20e-3, ax='x', pos=[0, 0, 5e-3])
+    geom.new_block(name="blk_chip", w=0.5e-3, h=0.2e-3, l=10e-3, ax='x', pos=[5e-3, 0, 5e-3])
+    geom.new_coaxport(name="cyl_cavity_drive", r1=0.5e-3, r2=0.2e-3, l1=6e-3, l2=5e-3, ax='x',
+                      pos=[-6e-3, 0, 2e-3])
+    geom.new_coaxport(name="cyl_output", r1=0.5e-3, r2=0.2e-3, l1=3e-3, l2=2e-3, ax='y',
+                      pos=[8e-3, -4e-3, 5e-3])
+    geom.difference(name="dif1",
+                    input1=["cyl_cavity", "blk_tube", "cyl_cavity_drive1", "cyl_output1"],
+                    input2=["cyl_stub", "cyl_cavity_drive2", "cyl_output2"],
+                    keep_input1=False, keep_input2=True, keep_intb=False)
+    geom.finish()
+
+
+#%% tests
+def test_lazy_build_runs_once():
+    model = _Model()
+    geom = geometry_mixin(model, lazy=True)
+    _wavepool(geom)
+
+    assert geom.run_count == 1
+    assert model.comp1.geom1.runs == [None]
+
+
+def test_eager_build_runs_per_feature():
+    model = _Model()
+    geom = geometry_mixin(model)
+    _wavepool(geom)
+
+    assert geom.run_count == len(model.comp1.geom1.order) + 1
+
+
+def test_deferred_block():
+    model = _Model()
+    geom = geometry_mixin(model)
+    with geom.deferred():
+        geom.new_cylinder(name="a", r=1, l=1)
+        geom.new_cylinder(name="b", r=1, l=1)
+    geom.finish()
+
+    assert geom.run_count == 1
+
+
+
+def test_apply_keeps_spec_order():
+    model = _Model()
+    geom = geometry_mixin(model)
+    spec = [Cylinder("a", 1, 2), Cylinder("b", 1, 2), Difference("dif1", ["a"], ["b"], False, True, False)]
+    geom.apply(spec)
+
+    spec = [Cylinder("a", 1, 2), Cylinder("b", 1, 2), Cylinder("c", 1, 1),
+            Difference("dif1", ["a"], ["b", "c"], False, True, False)]
+    assert geom.apply(spec) == ["c", "dif1"]
+    assert model.comp1.geom1.order == ["a", "b", "c", "dif1"]
+    assert geom.apply(spec) == []
+
+
+def test_apply_detects_in_place_edits():
+    geom = geometry_mixin(_Model())
+    spec = [Cylinder("a", 1, 2)]
+    geom.apply(spec)
+
+    spec[0].r = 5
+    assert geom.apply(spec) == ["a"]
+
+
+def test_apply_compares_numpy_and_bound_values():
+    geom = geometry_mixin(_Model())
+    geom.apply([Cylinder("a", 1, 2, pos=[np.float64(0), 0, 0])])
+
+    assert geom.apply([Cylinder("a", 1, 2, pos=[("x0", 0.0), 0, 0])]) == ["a"]
+    assert geom.apply([Cylinder("a", 1, 2, pos=[("x0", 0.0), 0, 0])]) == []
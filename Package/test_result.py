@@ -0,0 +1,111 @@
+import numpy as np
+
+from comsol_result import eval_global_mixin
+from comsol_epr import EPR_mixin
+
+
+#%% recording fake of an EvalGlobal node
+class _EvalGlobal:
+    def __init__(self, n_solutions, complex=False):
+        self.n_solutions = n_solutions
+        self.complex = complex
+        self.props = {'data': "dset1", 'outersolnum': "1"}
+        self.expr_sets = []
+        self.get_calls = 0
+
+    def set(self, key, value):
+        if key == "expr":
+            self.expr_sets.append(list(value))
+        self.props[key] = value
+
+    def getString(self, key):
+        return self.props[key]
+
+    def getReal(self):
+        # [expression][solution], a distinct positive value per entry
+        self.get_calls += 1
+        exprs = self.expr_sets[-1]
+        return [[1.0 + _i + 0.1*_j for _j in range(self.n_solutions)] for _i in range(len(exprs))]
+
+    def getImag(self):
+        return [[0.5]*self.n_solutions for _ in self.expr_sets[-1]]
+
+    def isComplex(self):
+        return self.complex
+
+
+class _Numerical:
+    def __init__(self, ev):
+        self.ev = ev
+
+    def tags(self):
+        return []
+
+    def create(self, name, kind):
+        return self.ev
+
+
+class _Node:
+    def __getattr__(self, name):
+        return lambda *args: self
+
+    def getString(self, key):
+        return "LJ1"
+
+
+class _Model:
+    def __init__(self, ev):
+        self.numerical_node = _Numerical(ev)
+
+    def result(self):
+        return self
+
+    def numerical(self, *args):
+        return self.numerical_node
+
+    def modelNode(self, name):
+        return _Node()
+
+    def lumped_index(self, phys):
+        return {'ports': {1: "lport1"}, 'junctions': {2: "lelem2"}}
+
+
+#%% tests
+def test_one_round_trip_per_evaluation():
+    ev = _EvalGlobal(n_solutions=3)
+    sev = eval_global_mixin(_Model(ev))
+
+    res = sev.evaluate(["emw.freq", "emw.Qfactor", "emw.freq"])
+    assert ev.expr_sets == [["emw.freq", "emw.Qfactor"]]
+    assert ev.get_calls == 1
+    assert list(res) == ["emw.freq", "emw.Qfactor"]
+    np.testing.assert_allclose(res["emw.Qfactor"], [2.0, 2.1, 2.2])
+
+    sev.evaluate(["emw.freq"])
+    assert len(ev.expr_sets) == 2
+    assert ev.get_calls == 2
+
+
+def test_settings_only_set_on_change():
+    ev = _EvalGlobal(n_solutions=1)
+    sev = eval_global_mixin(_Model(ev))
+
+    sev.evaluate("emw.freq", data="dset2")
+    ev.props['data'] = "changed elsewhere"
+    sev.evaluate("emw.freq", data="dset2")
+    assert ev.props['data'] == "changed elsewhere"
+
+    sev.evaluate("emw.freq")
+    assert ev.props['data'] == "dset1"
+
+
+def test_sweep_reshapes_all_outer_solutions():
+    n_outer, n_modes = 4, 3
+    ev = _EvalGlobal(n_solutions=n_outer*n_modes, complex=True)
+    res = EPR_mixin(_Model(ev)).sweep(n_outer=n_outer, data="dset2")
+
+    assert ev.props['outersolnum'] == "all"
+    assert ev.get_calls == 1
+    assert res.f.shape == (n_outer, n_modes)
+    # rows run over outer solutions, each followed by its modes
+    np.testing.assert_allclose(res.f[1], [1.3, 1.4, 1.5])
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+
+from comsol_server import ServerPool
+from comsol_sweep import SweepRunner
+
+
+#%% fake clients and builders (module level, so worker processes can unpickle them)
+class _FakeClient:
+    def __init__(self, comsol_root, pool):
+        self.pool = pool
+        self.port = pool.acquire() if pool is not None else None
+
+
+def _square(client, x):
+    # later points finish first
+    time.sleep(0.01 * (8 - x))
+    return x * x
+
+
+def _flaky(client, x, tmp):
+    marker = os.path.join(tmp, f"failed_{x}")
+    if (x % 3 == 0) and not os.path.exists(marker):
+        open(marker, 'w').close()
+        raise RuntimeError(f"point {x} failed")
+    return x
+
+
+def _always_fails(client, x):
+    raise RuntimeError("broken design")
+
+
+def _crash_once(client, x, tmp):
+    marker = os.path.join(tmp, "crashed")
+    if (x == 3) and not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return x
+
+
+def _lease(client, x):
+    time.sleep(0.05)
+    return os.getpid(), client.port
+
+
+#%% tests
+def test_results_in_grid_order():
+    runner = SweepRunner(_square, {'x': range(8)}, comsol_root=None, workers=3, client_factory=_FakeClient)
+    assert runner.run() == [x * x for x in range(8)]
+
+
+def test_grid_expansion():
+    runner = SweepRunner(_square, {'x': [1, 2], 'y': [3, 4, 5]}, comsol_root=None, client_factory=_FakeClient)
+    assert len(runner.points) == 6
+    assert runner.points[1] == {'x': 1, 'y': 4}
+
+
+def test_retries(tmp_path):
+    grid = [{'x': x, 'tmp': str(tmp_path)} for x in range(7)]
+    runner = SweepRunner(_flaky, grid, comsol_root=None, workers=2, retries=1, client_factory=_FakeClient)
+    assert runner.run() == list(range(7))
+
+
+def test_exhausted_retries_return_the_exception():
+    runner = SweepRunner(_always_fails, {'x': range(3)}, comsol_root=None, workers=2, retries=1,
+                         client_factory=_FakeClient)
+    results = runner.run()
+    assert all(isinstance(_r, RuntimeError) for _r in results)
+
+
+def test_worker_crash_restarts_executor(tmp_path):
+    grid = [{'x': x, 'tmp': str(tmp_path)} for x in range(8)]
+    runner = SweepRunner(_crash_once, grid, comsol_root=None, workers=3, retries=2, client_factory=_FakeClient)
+    assert runner.run() == list(range(8))
+
+
+def test_workers_lease_pool_servers(tmp_path):
+    stub = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "comsol_server.py"), "--stub"]
+    pool = ServerPool(size=2, base_port=23500, lock_path=str(tmp_path / "servers.json"), executable=stub)
+    try:
+        runner = SweepRunner(_lease, {'x': range(6)}, comsol_root=None, pool=pool, client_factory=_FakeClient)
+        leases = dict(runner.run())
+        # every worker holds its own server for the whole sweep
+        assert len(set(leases.values())) == len(leases)
+        assert set(leases.values()) <= {srv['port'] for srv in pool.start()}
+    finally:
+        pool.shutdown()
+
+
+def test_more_workers_than_servers_is_rejected(tmp_path):
+    pool = ServerPool(size=2, lock_path=str(tmp_path / "servers.json"))
+    try:
+        SweepRunner(_square, {'x': range(8)}, comsol_root=None, pool=pool, workers=4, client_factory=_FakeClient)
+    except ValueError:
+        return
+    assert False, "expected ValueError"
@@ -0,0 +1,62 @@
+from comsol_wrapper import JavaWrapper
+
+
+#%% fake physics tree
+class _Feature:
+    def __init__(self, tag, kind, active=True, **props):
+        self._tag = tag
+        self._kind = kind
+        self._active = active
+        self._props = props
+
+    def tag(self):
+        return self._tag
+
+    def getType(self):
+        return self._kind
+
+    def isActive(self):
+        return self._active
+
+    def getString(self, key):
+        if key not in self._props:
+            raise RuntimeError(f"Unknown property {key}")
+        return self._props[key]
+
+
+class _Physics:
+    def __init__(self, features):
+        self._features = features
+
+    def feature(self):
+        return self._features
+
+
+#%% tests
+def test_lumped_index_numbers_ports_and_junctions():
+    phys = JavaWrapper(_Physics([
+        _Feature("pec1", "PerfectElectricConductor"),
+        _Feature("lport1", "LumpedPort", PortName="2"),
+        _Feature("lport2", "LumpedPort", PortName="drive"),
+        _Feature("lport3", "LumpedPort", PortName="1"),
+        _Feature("lelement1", "LumpedElement", LumpedElementType="Resistor"),
+        _Feature("lelement2", "LumpedElement", LumpedElementType="Inductor"),
+    ]))
+
+    index = phys.lumped_index()
+    # the unnamed port does not overwrite the named ports 1 and 2
+    assert index['ports'] == {1: "lport3", 2: "lport1", 3: "lport2"}
+    assert index['junctions'] == {2: "lelement2"}
+
+
+def test_lumped_index_skips_inactive_features():
+    phys = JavaWrapper(_Physics([
+        _Feature("lport1", "LumpedPort", active=False, PortName="1"),
+        _Feature("lport2", "LumpedPort", PortName="2"),
+        _Feature("lelement1", "LumpedElement", active=False, LumpedElementType="Inductor"),
+        _Feature("lelement2", "LumpedElement", LumpedElementType="Inductor"),
+    ]))
+
+    index = phys.lumped_index()
+    assert index['ports'] == {2: "lport2"}
+    assert index['junctions'] == {1: "lelement2"}